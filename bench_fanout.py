@@ -0,0 +1,99 @@
+# bench_fanout.py
+"""
+Benchmark du serveur de diffusion (fanout.py) sur loopback.
+
+Pour 1..50 abonnés : coût de publication par point côté ingestion
+(FanoutServer.on_append, appelé sous le verrou du store), débit livré et
+trames perdues. Un abonné "lent" optionnel vérifie que le client qui ne lit
+pas ne freine pas l'ingestion.
+
+    python bench_fanout.py [--points 20000] [--subs 1,5,10,25,50] [--slow]
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+
+from fanout import FanoutServer, frame_struct
+
+
+def _reader(port, channels, every, counts, idx, ready, stop, slow=False):
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.sendall((json.dumps({"channels": channels, "every": every,
+                              "queue": 1024}) + "\n").encode("utf-8"))
+    fp = sock.makefile("rb")
+    fp.readline()
+    size = frame_struct(channels).size
+    ready.release()
+    if slow:
+        stop.wait()      # ne lit jamais : la file de l'abonné déborde
+        sock.close()
+        return
+    sock.settimeout(0.5)
+    got = 0
+    while not stop.is_set():
+        try:
+            data = fp.read1(65536)
+        except (socket.timeout, OSError):
+            continue
+        if not data:
+            break
+        got += len(data)
+        counts[idx] = got // size
+    sock.close()
+
+
+def run(n_subs, n_points, slow=False):
+    server = FanoutServer(port=0).start()
+    channels = ["t", "speed", "rpm", "throttle", "brake", "lapDist"]
+    counts = [0] * n_subs
+    ready = threading.Semaphore(0)
+    stop = threading.Event()
+    threads = []
+    for i in range(n_subs):
+        every = 1 if i % 2 == 0 else 3
+        th = threading.Thread(target=_reader, daemon=True, args=(
+            server.port, channels if i % 3 else ["speed", "lapDist"], every,
+            counts, i, ready, stop))
+        th.start()
+        threads.append(th)
+    if slow:
+        threading.Thread(target=_reader, daemon=True, args=(
+            server.port, channels, 1, [0], 0, ready, stop, True)).start()
+    for _ in range(n_subs + (1 if slow else 0)):
+        ready.acquire()
+    while len(server._subs) < n_subs + (1 if slow else 0):
+        time.sleep(0.01)
+
+    p = {"t": time.time(), "session_time": 0.0, "t_game_ms": 0.0, "speed": 250,
+         "rpm": 11000, "gear": 7, "throttle": 1.0, "brake": 0.0, "lap": 1,
+         "lapDist": 0.0, "invalid": 0, "delta_ms": None}
+    t0 = time.perf_counter()
+    for k in range(n_points):
+        p["lapDist"] = float(k)
+        server.on_append(p)
+    publish_s = time.perf_counter() - t0
+    time.sleep(1.0)
+    stop.set()
+    stats = server.stats()
+    server.stop()
+    dropped = sum(s["dropped"] for s in stats)
+    print(f"subs={n_subs:3d}{' +slow' if slow else '      '} "
+          f"publish={publish_s / n_points * 1e6:7.2f} µs/point "
+          f"({n_points / publish_s:9.0f} points/s) "
+          f"delivered={sum(counts):8d} dropped={dropped:7d}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--points", type=int, default=20000)
+    ap.add_argument("--subs", default="1,5,10,25,50")
+    ap.add_argument("--slow", action="store_true", help="ajoute un abonné qui ne lit pas")
+    args = ap.parse_args()
+    for n in (int(v) for v in args.subs.split(",")):
+        run(n, args.points, slow=args.slow)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# capture_headless.py
+"""
+Capture / enregistrement F1 25 sans dashboard.
+
+N'importe que le parser, le store et les étages incrémentaux (stdlib) :
+pas de Dash, Plotly ni pandas. Les tours terminés sont archivés dans
+LOG_DIR et indexés dans le catalogue (session_catalog).
+
+    python capture_headless.py [--ip 0.0.0.0] [--port 20777] [--fanout 20780]
+                               [--api 8765] [--reference logs/x.csv:12]
+
+Mesure du démarrage :
+
+    python -X importtime capture_headless.py 2> importtime.txt
+"""
+import time
+
+_T0 = time.perf_counter()
+
+import argparse  # noqa: E402
+
+from telemetry_capture import UDP_IP, UDP_PORT, run_capture  # noqa: E402
+from telemetry_store import get_logger  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Capture UDP F1 25 sans dashboard")
+    ap.add_argument("--ip", default=UDP_IP)
+    ap.add_argument("--port", type=int, default=UDP_PORT)
+    ap.add_argument("--fanout", type=int, metavar="PORT",
+                    help="diffusion locale des points (TCP 127.0.0.1:PORT, voir fanout.py)")
+    ap.add_argument("--api", type=int, metavar="PORT",
+                    help="API HTTP du store pour les workers Dash (voir store_api.py)")
+    ap.add_argument("--reference", metavar="CSV:LAP",
+                    help="tour de référence du delta (CSV de session archivé)")
+    args = ap.parse_args()
+    get_logger()
+
+    if args.reference:
+        from lap_delta import delta_tracker, load_reference_csv
+        path, _, lap = args.reference.rpartition(":")
+        ref = load_reference_csv(path, int(lap))
+        delta_tracker.set_reference(ref, pinned=True)
+        print(f"[headless] Référence delta: {path} lap {lap} ({ref.lap_ms / 1000.0:.3f} s)")
+
+    if args.api:
+        from store_api import start_api
+        start_api(args.api)
+        print(f"[headless] API store sur 127.0.0.1:{args.api}")
+
+    startup_ms = (time.perf_counter() - _T0) * 1000.0
+    print(f"[headless] Prêt en {startup_ms:.0f} ms (imports + init)")
+    get_logger().info("headless capture startup: %.1f ms", startup_ms)
+    run_capture(args.ip, args.port, fanout_port=args.fanout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# console_status.py
+import sys
+import threading
+
+
+class ConsoleStatus:
+    """
+    Ligne de statut console rendue dans son propre thread.
+    Le producteur (boucle de capture) ne fait qu'affecter `latest` (tuple,
+    affectation atomique) ; le formatage et l'écriture sur stdout, qui peut
+    bloquer si le terminal rame, se font ici à `hz` Hz maximum.
+    """
+
+    def __init__(self, hz: float = 20.0, stream=None):
+        self.period = 1.0 / hz
+        self.stream = stream or sys.stdout
+        # (speed, position, lap, last_lap_ms, invalid, cur_lap_ms, delta_ms)
+        self.latest = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="console-status", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        shown = None
+        while not self._stop.wait(self.period):
+            state = self.latest
+            if state is None or state is shown:
+                continue
+            shown = state
+            try:
+                self.stream.write(self.render(state))
+                self.stream.flush()
+            except Exception:
+                pass
+
+    @staticmethod
+    def render(state) -> str:
+        speed, pos, lap, last_ms, invalid, cur_ms, delta = state
+        delta_str = "—" if delta is None else f"{delta / 1000.0:+.3f} s"
+        return (
+            f"\rVitesse: {speed:4d} km/h "
+            f"Pos: {pos} Lap: {lap} "
+            f"LastLap: {last_ms} ms Invalid: {invalid} "
+            f"Laps time: {cur_ms:.0f} ms "
+            f"Delta: {delta_str} "
+        )
@@ -1,19 +1,22 @@
 
 # dash_fi.py
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State, Patch, no_update
+from flask import Response, request, stream_with_context
 import plotly.graph_objs as go
 import time
+import logging
 import threading
 import os
-import pandas as pd
 
-from telemetry_store import telemetry_stat, dump_snapshot, get_logger, snapshot
-from telemetry_capture import run_capture
+from telemetry_store import get_logger
+from telemetry_export import FORMATS, check_format
+from store_client import LocalSource, TimelineMirror, make_source
+from trace_cache import trace_cache
 
 # --------- Config ---------
 UPDATE_INTERVAL_MS = 600
-RESTART_MARGIN_MS = 50.0
-RESTART_MARGIN_DIST = 5.0
+MAP_INTERVAL_MS = 100          # carte : positions des voitures à 10 Hz
+MAP_HEAT_REFRESH_S = 1.0       # heat-map : couleurs rafraîchies au plus 1x/s
 POINTS_GL_THRESHOLD = 20000
 DECIMATE_1 = 80000
 DECIMATE_2 = 150000
@@ -30,7 +33,18 @@ LAP_COLORS = [
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
 app = Dash(__name__, assets_folder=ASSETS_DIR)
 app.title = "F1 Live Telemetry"
-_logger = get_logger()
+server = app.server            # gunicorn -w N dash_fi:server
+_logger = logging.getLogger("telemetry")   # handlers : telemetry_store.get_logger()
+
+# Données : capture locale (même process) ou API du process de capture
+# (TELEMETRY_SOURCE=http://127.0.0.1:8765) quand Dash tourne sur N workers.
+# Le miroir est partagé par les onglets du worker ; l'état de rendu est
+# propre à chaque onglet (dcc.Store).
+SOURCE = make_source()
+mirror = TimelineMirror(SOURCE)
+EXPORT_MIME = {"csv": ("csv", "text/csv"), "raw": ("f1tl", "application/octet-stream"),
+               "parquet": ("parquet", "application/octet-stream"),
+               "arrow": ("arrow", "application/octet-stream")}
 
 
 def make_empty_fig(title, y_title=None,
@@ -71,72 +85,201 @@ app.layout = html.Div([
                    "borderColor": "#444"},
             className="dark-dropdown"
         ),
-        html.Button("Exporter CSV", id="btn_export",
-                    n_clicks=0, style={"marginLeft": "12px"}),
-        dcc.Download(id="download_csv"),
     ], style={"margin": "8px 0"}),
 
+    html.Div([
+        html.Label("Exporter"),
+        dcc.Dropdown(
+            id="export_laps",
+            multi=True,
+            placeholder="Tous les laps",
+            style={"color": "#EEE", "backgroundColor": "#222",
+                   "borderColor": "#444", "width": "300px"},
+            className="dark-dropdown"
+        ),
+        dcc.Dropdown(
+            id="export_format",
+            options=[{"label": f.upper(), "value": f} for f in FORMATS],
+            value="csv", clearable=False,
+            style={"color": "#EEE", "backgroundColor": "#222",
+                   "borderColor": "#444", "width": "120px"},
+            className="dark-dropdown"
+        ),
+        html.A(html.Button("Exporter"), id="export_link", href="/export/csv",
+               target="_blank", style={"marginLeft": "12px"}),
+    ], style={"margin": "8px 0", "display": "flex", "gap": "8px",
+              "alignItems": "center"}),
+
     dcc.Interval(id="update", interval=UPDATE_INTERVAL_MS, n_intervals=0),
+    dcc.Store(id="render_state", storage_type="memory"),
+    dcc.Store(id="table_state", storage_type="memory"),
+    dcc.Store(id="map_state", storage_type="memory"),
     dcc.Graph(id="speed_graph"),
     dcc.Graph(id="rpm_graph"),
     dcc.Graph(id="gear_graph"),
     dcc.Graph(id="throttle_brake_graph"),
+
+    html.H3("Carte de piste"),
+    dcc.RadioItems(
+        id="map_heat",
+        options=[{"label": " Vitesse", "value": "speed"},
+                 {"label": " Frein", "value": "brake"},
+                 {"label": " Gaz", "value": "throttle"}],
+        value="speed", inline=True,
+    ),
+    dcc.Interval(id="map_update", interval=MAP_INTERVAL_MS, n_intervals=0),
+    dcc.Graph(id="track_map_graph", style={"height": "600px"}),
+
+    html.H3("Analyse des tours"),
+    html.Div(id="lap_table", style={"fontFamily": "monospace"}),
 ], style={"padding": "10px", "backgroundColor": "#111", "color": "#EEE"})
 
-# --- État global / incrémental (inchangé par rapport à la version OK chez toi) ---
-_last_render_ts = 0.0
-_prev_figs = None
-_laps_index = {}
-_last_buf_len = 0
-_last_overlay_key = ""
+
+@server.before_request
+def _setup_logging():
+    # gunicorn importe dash_fi:server sans passer par __main__ ; idempotent
+    get_logger()
 
 
 @app.callback(Output("dump_status", "children"), Input("btn_dump", "n_clicks"))
 def do_dump(n):
     if not n:
         return ""
-    path = dump_snapshot(max_points=30000, filename_prefix="snapshot_manual")
+    path = SOURCE.dump()
     return f"Snapshot écrit: {path}" if path else "Snapshot: erreur (voir logs)"
 
 
-def _update_laps_index(new_points):
-    last_t_ms, last_dist = {}, {}
-    for lap, segs in _laps_index.items():
-        if segs and segs[-1]:
-            p_last = segs[-1][-1]
-            last_t_ms[lap] = float(p_last.get("t_game_ms", 0.0))
-            last_dist[lap] = float(p_last.get("lapDist", 0.0))
-    restart_cnt_local = 0
-    for p in new_points:
-        lap = p.get("lap", None)
-        if lap is None:
-            continue
-        t_ms = float(p.get("t_game_ms", 0.0) or 0.0)
-        dist = float(p.get("lapDist", 0.0) or 0.0)
-        if lap not in _laps_index:
-            _laps_index[lap] = [[p]]
-            last_t_ms[lap] = t_ms
-            last_dist[lap] = dist
-            continue
-        jump_back = (t_ms < (last_t_ms.get(lap, 0.0) - RESTART_MARGIN_MS))
-        zero_reset = (last_t_ms.get(lap, 0.0) >
-                      RESTART_MARGIN_MS) and (t_ms == 0.0)
-        dist_back = (dist < (last_dist.get(lap, 0.0) - RESTART_MARGIN_DIST))
-        if jump_back or zero_reset or dist_back:
-            _laps_index[lap].append([p])
-            restart_cnt_local += 1
-        else:
-            _laps_index[lap][-1].append(p)
-        last_t_ms[lap] = t_ms
-        last_dist[lap] = dist
-    return restart_cnt_local
-
-
-@app.callback(Output("overlay_laps", "options"), Input("update", "n_intervals"))
+@app.callback(Output("overlay_laps", "options"), Output("export_laps", "options"),
+              Input("update", "n_intervals"))
 def update_overlay_options(_):
-    laps = sorted(_laps_index.keys())
+    laps = mirror.lap_keys()
     latest = max(laps) if laps else None
-    return [{"label": f"Lap {int(l)}", "value": int(l)} for l in laps if l != latest]
+    overlay = [{"label": f"Lap {int(l)}", "value": int(l)} for l in laps if l != latest]
+    export = [{"label": f"Lap {int(l)}", "value": int(l)} for l in laps]
+    return overlay, export
+
+
+HEAT_SCALES = {"speed": "Turbo", "brake": "Reds", "throttle": "Greens"}
+
+
+def _cars_xy(cars_state):
+    cars, player_idx = cars_state["cars"], cars_state["player_idx"]
+    xs = [c[0] for c in cars]
+    zs = [c[1] for c in cars]
+    colors = ["#FFD166" if i == player_idx else "#AAAAAA" for i in range(len(cars))]
+    return xs, zs, colors
+
+
+def _build_map_fig(channel, full):
+    fig = go.Figure()
+    fig.update_layout(template="plotly_dark", uirevision="map", showlegend=False,
+                      margin=dict(l=10, r=10, t=30, b=10),
+                      xaxis=dict(visible=False),
+                      yaxis=dict(visible=False, scaleanchor="x", scaleratio=1))
+    outline = full["outline"]
+    if not outline:
+        fig.update_layout(title="Tracé en attente d'un premier tour propre")
+    bins = full["bins"]
+    fig.add_trace(go.Scatter(
+        x=[p[0] for p in outline], y=[p[1] for p in outline], mode="lines",
+        line=dict(color="#555", width=8), hoverinfo="skip"))
+    fig.add_trace(go.Scattergl(
+        x=[p[0] for p in bins], y=[p[1] for p in bins], mode="markers",
+        marker=dict(size=6, color=full["heat"],
+                    colorscale=HEAT_SCALES.get(channel, "Turbo"), showscale=True),
+        hoverinfo="skip"))
+    xs, zs, colors = _cars_xy(full)
+    fig.add_trace(go.Scatter(x=xs, y=zs, mode="markers",
+                             marker=dict(size=11, color=colors,
+                                         line=dict(width=1, color="#000"))))
+    return fig
+
+
+@app.callback(Output("track_map_graph", "figure"), Output("map_state", "data"),
+              Input("map_update", "n_intervals"), Input("map_heat", "value"),
+              State("map_state", "data"))
+def update_track_map(_, channel, state):
+    """
+    Figure complète seulement si le tracé ou le canal change ; sinon Patch
+    partiel : couleurs des bins (<= 1 Hz) et positions des 22 voitures.
+    Les versions déjà envoyées sont gardées par onglet (map_state).
+    """
+    channel = channel or "speed"
+    ver = SOURCE.track_versions()
+    key = [ver["outline"], channel]
+    now = time.time()
+    if not state or state.get("key") != key:
+        state = {"key": key, "heat": ver["heat"], "heat_ts": now, "cars": ver["cars"]}
+        return _build_map_fig(channel, SOURCE.track_full(channel)), state
+
+    patch = Patch()
+    changed = False
+    if (ver["heat"] != state["heat"]
+            and now - state["heat_ts"] >= MAP_HEAT_REFRESH_S):
+        patch["data"][1]["marker"]["color"] = SOURCE.track_heat(channel)["heat"]
+        state["heat"] = ver["heat"]
+        state["heat_ts"] = now
+        changed = True
+    if ver["cars"] != state["cars"]:
+        xs, zs, colors = _cars_xy(SOURCE.track_cars())
+        patch["data"][2]["x"] = xs
+        patch["data"][2]["y"] = zs
+        patch["data"][2]["marker"]["color"] = colors
+        state["cars"] = ver["cars"]
+        changed = True
+    return (patch, state) if changed else (no_update, no_update)
+
+
+def _fmt_ms(ms):
+    if not ms:
+        return "—"
+    ms = int(ms)
+    return f"{ms // 60000}:{(ms % 60000) / 1000.0:06.3f}"
+
+
+@app.callback(Output("lap_table", "children"), Output("table_state", "data"),
+              Input("update", "n_intervals"), State("table_state", "data"))
+def update_lap_table(_, known_version):
+    res = SOURCE.laps(known_version)
+    if res["laps"] is None:
+        return no_update, no_update
+    rows = res["laps"]
+    if not rows:
+        return "Aucun tour terminé", res["version"]
+    best = min((r["lap_ms"] for r in rows
+                if r.get("complete") and not r["invalid"] and r["lap_ms"]),
+               default=None)
+    cell = {"padding": "2px 10px", "textAlign": "right"}
+    header = html.Tr([html.Th(h, style=cell) for h in (
+        "Lap", "Temps", "S1", "S2", "S3", "Vmax", "Virages",
+        "Vmin (moy)", "Rapports", "Valide")])
+    body = []
+    for r in rows:
+        mins = [c["min_speed"] for c in r["corners"]]
+        vmin = f"{sum(mins) / len(mins):.0f}" if mins else "—"
+        color = "#C77DFF" if r["lap_ms"] == best else None
+        body.append(html.Tr([html.Td(v, style=cell) for v in (
+            r["lap"], _fmt_ms(r["lap_ms"]), _fmt_ms(r["s1_ms"]),
+            _fmt_ms(r["s2_ms"]), _fmt_ms(r["s3_ms"]), r["top_speed"],
+            len(r["corners"]), vmin, r["gear_shifts"],
+            "non" if r["invalid"] else ("oui" if r.get("complete") else "partiel"))],
+            style={"color": color}))
+    return html.Table([header] + body), res["version"]
+
+
+def _trace_values(pts, channel):
+    if channel == "x":
+        t0_s = float(pts[0].get("t_game_ms", 0.0)) / 1000.0
+        return [float(pp.get("t_game_ms", 0.0)) / 1000.0 - t0_s for pp in pts]
+    if channel in ("throttle", "brake"):
+        return [float(pp.get(channel, 0.0)) for pp in pts]
+    return [int(pp.get(channel, 0)) for pp in pts]
+
+
+def _lap_trace(lap, pts, seg, channel, dec):
+    """Valeurs décimées d'un canal pour un tour terminé (mémoïsées)."""
+    key = (trace_cache.session, lap, seg[0], seg[1], channel, dec)
+    return trace_cache.get(key, lambda: _trace_values(pts, channel)[::dec])
 
 
 @app.callback(
@@ -145,12 +288,17 @@ def update_overlay_options(_):
     Output("rpm_graph", "figure"),
     Output("gear_graph", "figure"),
     Output("throttle_brake_graph", "figure"),
+    Output("render_state", "data"),
     Input("update", "n_intervals"),
     Input("overlay_laps", "value"),
+    State("render_state", "data"),
 )
-def update_graphs(_, overlay_value):
-    global _last_render_ts, _prev_figs, _last_buf_len, _last_overlay_key
-
+def update_graphs(_, overlay_value, state):
+    """
+    Le miroir du worker est rafraîchi (nouveaux points, coupes de flashback) ;
+    les figures ne sont reconstruites que si la timeline ou la sélection a
+    changé depuis le dernier rendu de cet onglet (render_state).
+    """
     t_start = time.perf_counter()
     speed_fig = make_empty_fig("Vitesse (km/h)", "km/h")
     rpm_fig = make_empty_fig("Régime moteur (RPM)", "RPM")
@@ -158,14 +306,14 @@ def update_graphs(_, overlay_value):
     tb_fig = make_empty_fig("Pédales (Throttle / Brake)", "0..1")
 
     try:
-        buf, stat = snapshot()
-        if not buf:
+        stat = mirror.refresh()
+        last = mirror.last_point()
+        if last is None:
             status = "Buffer: 0 points\nDernière mise à jour: —"
-            _prev_figs = (status, speed_fig, rpm_fig, gear_fig, tb_fig)
-            return status, speed_fig, rpm_fig, gear_fig, tb_fig
+            return status, speed_fig, rpm_fig, gear_fig, tb_fig, None
 
         now = time.time()
-        last_ts = buf[-1].get("t", 0.0)
+        last_ts = last.get("t", 0.0)
         stalled_for = now - float(stat.get("last_append_wall", last_ts))
         stall_msg = f"\nFlux inactif: {stalled_for:.1f}s" if stalled_for > STALL_WARN_S else ""
 
@@ -178,36 +326,25 @@ def update_graphs(_, overlay_value):
                 pass
         overlay_key = ",".join(map(str, sorted(overlay_laps)))
 
-        if (last_ts <= _last_render_ts) and _prev_figs is not None and (overlay_key == _last_overlay_key):
-            status_prev, s_prev, r_prev, g_prev, t_prev = _prev_figs
-            status = status_prev.split("\n")[0] + \
-                f"\nDernière mise à jour: {time.strftime('%H:%M:%S', time.localtime(_last_render_ts))}{stall_msg}"
-            return status, s_prev, r_prev, g_prev, t_prev
-
-        buf_len = len(buf)
-        new_points = buf[_last_buf_len:buf_len] if buf_len > _last_buf_len else []
-        restart_cnt = _update_laps_index(new_points)
-        _last_buf_len = buf_len
-
-        def segment_coverage(seg):
-            ds = [float(x.get("lapDist", 0.0)) for x in seg]
-            if ds:
-                cov_d = (max(ds) - min(ds))
-                if cov_d >= 0.1:
-                    return cov_d
-            ts = [float(x.get("t_game_ms", 0.0)) for x in seg]
-            return (max(ts) - min(ts)) if ts else 0.0
-
-        all_laps = sorted(_laps_index.keys())
+        # Flashback : le miroir a déjà coupé la timeline ; 'end' peut donc
+        # revenir à une valeur déjà rendue, d'où la comparaison sur 'rewinds'.
+        rewinds = int(stat.get("rewinds", 0))
+        render_key = [mirror.end, rewinds, overlay_key]
+        if state and state.get("key") == render_key:
+            status = state["status"] + \
+                f"\nDernière mise à jour: {time.strftime('%H:%M:%S', time.localtime(last_ts))}{stall_msg}"
+            return status, no_update, no_update, no_update, no_update, no_update
+
+        all_laps = mirror.lap_keys()
         latest_lap = max(all_laps) if all_laps else None
-        current_pts = _laps_index.get(
-            latest_lap, [[]])[-1] if latest_lap is not None else []
+        current_pts = mirror.lap_points(latest_lap) if latest_lap is not None else []
 
+        trace_cache.sync(stat.get("last_session_uid"), rewinds, mirror.segments)
         overlay_pts_by_lap = {}
         for lap in overlay_laps:
-            segs = _laps_index.get(lap, [])
-            if segs:
-                overlay_pts_by_lap[lap] = max(segs, key=segment_coverage)
+            pts, seg = mirror.lap_slice(lap)
+            if pts:
+                overlay_pts_by_lap[lap] = (pts, seg)
 
         x_title = "Temps de tour (s)"
         total_points = 0
@@ -262,21 +399,10 @@ def update_graphs(_, overlay_value):
                                               legendgroup=grp))
 
         # Overlays sélectionnés
+        # (tours terminés : tableaux x/y servis par trace_cache)
         for lap in overlay_pts_by_lap:
             i += 1
-            pts = overlay_pts_by_lap[lap]
-            if not pts:
-                continue
-            x_raw_s = [float(pp.get("t_game_ms", 0.0)) / 1000.0 for pp in pts]
-            if not x_raw_s:
-                continue
-            t0_s = x_raw_s[0]
-            x_s = [xi - t0_s for xi in x_raw_s]
-            speed = [int(pp.get("speed", 0)) for pp in pts]
-            rpm_vals = [int(pp.get("rpm", 0)) for pp in pts]
-            gear_vals = [int(pp.get("gear", 0)) for pp in pts]
-            thr = [float(pp.get("throttle", 0.0)) for pp in pts]
-            brk = [float(pp.get("brake", 0.0)) for pp in pts]
+            pts, seg = overlay_pts_by_lap[lap]
             total_points += len(pts)
             ScatterClass = go.Scattergl if total_points > POINTS_GL_THRESHOLD else go.Scatter
             dec = 1
@@ -284,12 +410,12 @@ def update_graphs(_, overlay_value):
                 dec = 2
             if total_points > DECIMATE_2:
                 dec = 4
-            x_plot = x_s[::dec]
-            speed_plot = speed[::dec]
-            rpm_plot = rpm_vals[::dec]
-            gear_plot = gear_vals[::dec]
-            thr_plot = thr[::dec]
-            brk_plot = brk[::dec]
+            x_plot = _lap_trace(lap, pts, seg, "x", dec)
+            speed_plot = _lap_trace(lap, pts, seg, "speed", dec)
+            rpm_plot = _lap_trace(lap, pts, seg, "rpm", dec)
+            gear_plot = _lap_trace(lap, pts, seg, "gear", dec)
+            thr_plot = _lap_trace(lap, pts, seg, "throttle", dec)
+            brk_plot = _lap_trace(lap, pts, seg, "brake", dec)
             col = LAP_COLORS[i % len(LAP_COLORS)]
             grp = f"lap{lap}"
             speed_fig.add_trace(ScatterClass(x=x_plot, y=speed_plot, mode="lines",
@@ -322,10 +448,24 @@ def update_graphs(_, overlay_value):
         duration_ms = (t_end - t_start) * 1000.0
         laps_list = (
             [latest_lap] if latest_lap is not None else []) + overlay_laps
+        delta = last.get("delta_ms")
+        ref = SOURCE.delta_ref() if delta is not None else None
+        if ref is not None and not ref.get("pinned") and ref.get("session") != last.get("session_uid"):
+            ref = None   # référence d'une autre session (le tracker l'abandonne)
+        delta_msg = (f"Delta (réf. Lap {ref['lap']}): {delta / 1000.0:+.3f} s\n"
+                     if ref is not None else "")
+        cs = trace_cache.stats()
+        cache_msg = (f"Cache traces: {cs['hit_rate']:.0%} "
+                     f"({cs['hits']}/{cs['hits'] + cs['misses']}, {cs['entries']} entrées)\n")
+        dropped = int(stat.get("log_dropped", 0))
+        drop_msg = f"Logs perdus (file pleine): {dropped}\n" if dropped else ""
         status = (
-            f"Buffer: {len(buf)} points\n"
+            f"Buffer: {len(mirror)} points\n"
+            f"{delta_msg}"
+            f"{drop_msg}"
             f"Laps affichés: {len(laps_list)} ({', '.join(map(str, laps_list))})\n"
-            f"Restart détectés: {restart_cnt}\n"
+            f"Flashbacks détectés: {rewinds}\n"
+            f"{cache_msg}"
             f"Points total (affichés): {total_points}\n"
             f"callback={duration_ms:.1f} ms\n"
             f"Dernière mise à jour: {time.strftime('%H:%M:%S', time.localtime(last_ts))}{stall_msg}"
@@ -333,43 +473,64 @@ def update_graphs(_, overlay_value):
 
         if duration_ms > 400.0:
             _logger.warning("Dash callback slow: %.1f ms (buf=%d, laps=%s, points=%d)",
-                            duration_ms, len(buf), laps_list, total_points)
+                            duration_ms, len(mirror), laps_list, total_points)
 
-        _prev_figs = (status, speed_fig, rpm_fig, gear_fig, tb_fig)
-        _last_render_ts = last_ts
-        _last_overlay_key = overlay_key
-        return status, speed_fig, rpm_fig, gear_fig, tb_fig
+        state = {"key": render_key, "status": status.split("\n")[0]}
+        return status, speed_fig, rpm_fig, gear_fig, tb_fig, state
 
     except Exception as e:
         _logger.error("update_graphs ERROR: %s", e, exc_info=True)
         status = f"Erreur callback — {type(e).__name__}: {e}"
-        _prev_figs = (status, speed_fig, rpm_fig, gear_fig, tb_fig)
-        return status, speed_fig, rpm_fig, gear_fig, tb_fig
-
-
-@app.callback(Output("download_csv", "data"),
-              Input("btn_export", "n_clicks"), prevent_initial_call=True)
-def export_csv(n_clicks):
-    buf, _ = snapshot()
-    if not buf:
-        return None
-    df = pd.DataFrame(buf)
-    cols = ["t", "t_game_ms", "speed", "rpm", "gear",
-            "throttle", "brake", "lap", "invalid", "lapDist"]
-    for c in cols:
-        if c not in df.columns:
-            df[c] = None
-    df = df[cols]
-    filename = time.strftime("telemetry_%Y%m%d_%H%M%S.csv")
-    return dcc.send_data_frame(df.to_csv, filename, index=False)
+        return status, speed_fig, rpm_fig, gear_fig, tb_fig, None
+
+
+@app.callback(Output("export_link", "href"),
+              Input("export_format", "value"), Input("export_laps", "value"))
+def update_export_link(fmt, laps):
+    href = f"/export/{fmt or 'csv'}"
+    if laps:
+        href += "?laps=" + ",".join(str(int(l)) for l in laps)
+    return href
+
+
+@app.server.route("/export/<fmt>")
+def export_route(fmt):
+    """
+    Export en flux par tranches (telemetry_export) : le CSV et le format brut
+    sont streamés directement, Parquet/Arrow (si pyarrow est installé)
+    passent par un fichier disque.
+    Servi par Flask hors des callbacks Dash ; le verrou du store n'est tenu
+    que le temps de copier une tranche. Avec une source distante, le flux
+    est relayé depuis l'API du process de capture.
+    Paramètres : laps=1,2,3 ; t0/t1 = bornes sur 't' (epoch s).
+    """
+    try:
+        check_format(fmt)
+        laps = [int(v) for v in request.args.get("laps", "").split(",") if v.strip()]
+        t0, t1 = request.args.get("t0"), request.args.get("t1")
+        t_range = (float(t0) if t0 else None, float(t1) if t1 else None) if (t0 or t1) else None
+    except ValueError as e:
+        return Response(f"requête invalide: {e}", status=400)
+    stamp = time.strftime("telemetry_%Y%m%d_%H%M%S")
+    try:
+        gen = SOURCE.export_stream(fmt, laps=laps, t_range=t_range)
+    except Exception as e:
+        _logger.error("export %s ERROR: %s", fmt, e, exc_info=True)
+        return Response("export: erreur (voir logs)", status=500)
+    ext, mime = EXPORT_MIME[fmt]
+    return Response(stream_with_context(gen), mimetype=mime, headers={
+        "Content-Disposition": f"attachment; filename={stamp}.{ext}"})
 
 
 def start_capture_in_background():
+    from telemetry_capture import run_capture
     th = threading.Thread(target=run_capture, daemon=True)
     th.start()
     return th
 
 
 if __name__ == "__main__":
-    start_capture_in_background()
+    get_logger()
+    if isinstance(SOURCE, LocalSource):
+        start_capture_in_background()
     app.run(host="127.0.0.1", port=8050, debug=True, use_reloader=False)
@@ -1,6 +1,10 @@
+import logging
 import struct
 from typing import List, Optional
 
+# Logger partagé (handlers installés par telemetry_store.get_logger)
+_logger = logging.getLogger("telemetry")
+
 # Constantes
 MAX_NUM_CARS_IN_UDP_DATA = 22
 MAX_PARTICIPANT_NAME_LEN = 32
@@ -99,15 +103,53 @@ class WeatherForecastSample:
 
 
 class PacketSessionData:
+    _HEAD_FMT = '<BbbBHBbB'   # weather .. formula
+
     def __init__(self, data: bytes):
         self.header = PacketHeader(data)
-        # Parsing simplifié, à compléter
-        offset = 29
-        self.weather = data[offset]
-        offset += 1
-        self.trackTemperature = struct.unpack('<b', data[offset:offset+1])[0]
+        # Parsing simplifié (champs d'identification de la session), à compléter
+        (
+            self.weather,
+            self.trackTemperature,
+            self.airTemperature,
+            self.totalLaps,
+            self.trackLength,
+            self.sessionType,
+            self.trackId,
+            self.formula,
+        ) = struct.unpack_from(self._HEAD_FMT, data, 29)
         # ... continuer pour tous les champs
 
+
+class ParticipantData:
+    _STRUCT_FMT = '<BBBBBBB32sBBHBB12s'
+    _STRUCT_SIZE = struct.calcsize(_STRUCT_FMT)  # 57
+
+    def __init__(self, data: bytes):
+        unpacked = struct.unpack(self._STRUCT_FMT, data[:self._STRUCT_SIZE])
+        self.aiControlled = unpacked[0]
+        self.driverId = unpacked[1]
+        self.networkId = unpacked[2]
+        self.teamId = unpacked[3]
+        self.myTeam = unpacked[4]
+        self.raceNumber = unpacked[5]
+        self.nationality = unpacked[6]
+        self.name = unpacked[7].split(b"\0", 1)[0].decode("utf-8", "replace")
+        self.yourTelemetry = unpacked[8]
+        self.showOnlineNames = unpacked[9]
+        self.techLevel = unpacked[10]
+        self.platform = unpacked[11]
+        self.numColours = unpacked[12]
+
+
+class PacketParticipantsData:
+    def __init__(self, data: bytes):
+        self.header = PacketHeader(data)
+        self.numActiveCars = data[29]
+        stride = ParticipantData._STRUCT_SIZE
+        self.participants = [ParticipantData(
+            data[30 + i*stride:30 + (i+1)*stride]) for i in range(MAX_NUM_CARS_IN_UDP_DATA)]
+
 # Classe pour CarTelemetryData (complète)
 
 
@@ -260,14 +302,14 @@ def parse_packet(data: bytes) -> Optional[object]:
         try:
             return PacketMotionData(data)
         except struct.error as e:
-            print(f"[MOTION struct.error] len={len(data)} -> {e}")
+            _logger.warning("[MOTION struct.error] len=%d -> %s", len(data), e)
             return None
 
     elif packet_id == PacketId.SESSION:
         try:
             return PacketSessionData(data)
         except struct.error as e:
-            print(f"[SESSION struct.error] len={len(data)} -> {e}")
+            _logger.warning("[SESSION struct.error] len=%d -> %s", len(data), e)
             return None
 
     elif packet_id == PacketId.LAP_DATA:
@@ -281,8 +323,8 @@ def parse_packet(data: bytes) -> Optional[object]:
             return PacketLapData(data)
         except struct.error as e:
             # <<< TA LIGNE ÉTAIT INCOMPLÈTE ICI >>>
-            print(
-                f"[LAP struct.error] len={total_len}, stride_guess={stride_guess:.3f} -> {e}")
+            _logger.warning("[LAP struct.error] len=%d, stride_guess=%.3f -> %s",
+                            total_len, stride_guess, e)
             return None
 
     elif packet_id == PacketId.EVENT:
@@ -290,8 +332,11 @@ def parse_packet(data: bytes) -> Optional[object]:
         return None
 
     elif packet_id == PacketId.PARTICIPANTS:
-        # À implémenter
-        return None
+        try:
+            return PacketParticipantsData(data)
+        except struct.error as e:
+            _logger.warning("[PARTICIPANTS struct.error] len=%d -> %s", len(data), e)
+            return None
 
     elif packet_id == PacketId.CAR_SETUPS:
         # À implémenter
@@ -301,7 +346,7 @@ def parse_packet(data: bytes) -> Optional[object]:
         try:
             return PacketCarTelemetryData(data)
         except struct.error as e:
-            print(f"[CAR_TELEMETRY struct.error] len={len(data)} -> {e}")
+            _logger.warning("[CAR_TELEMETRY struct.error] len=%d -> %s", len(data), e)
             return None
 
     elif packet_id == PacketId.CAR_STATUS:
@@ -0,0 +1,249 @@
+# fanout.py
+"""
+Diffusion locale des points de télémétrie décodés vers N abonnés
+(overlays, scripts de stratégie, loggers) sans partager le port UDP 20777.
+
+Protocole (TCP loopback, ou socket Unix si FANOUT_UNIX est défini) :
+  1. le client envoie une ligne JSON :
+       {"channels": ["speed", "rpm"], "every": 2, "queue": 256}
+     channels vide => tous les FANOUT_CHANNELS ; every = décimation (1 point
+     sur N) ; queue = profondeur de la file de l'abonné ;
+  2. le serveur répond une ligne JSON {"channels": [...], "format": "<..."} ;
+  3. puis des trames binaires : longueur u16, seq u32, valeurs des canaux
+     (double pour 't'/'session_time', float32 sinon, NaN si absent).
+
+Chaque abonné a une file bornée (drop-oldest) et son propre thread d'envoi :
+un client lent perd des trames mais ne ralentit jamais l'ingestion.
+"""
+import collections
+import json
+import logging
+import math
+import os
+import socket
+import struct
+import threading
+
+from telemetry_store import add_listener, remove_listener
+
+# --------- Config ---------
+FANOUT_HOST = "127.0.0.1"
+FANOUT_PORT = int(os.getenv("FANOUT_PORT", "0"))     # 0 => désactivé
+FANOUT_UNIX = os.getenv("FANOUT_UNIX", "")           # chemin de socket Unix
+DEFAULT_QUEUE = 256
+MAX_QUEUE = 65536
+
+FANOUT_CHANNELS = ["t", "session_time", "t_game_ms", "speed", "rpm", "gear",
+                   "throttle", "brake", "lap", "lapDist", "invalid", "delta_ms"]
+_DOUBLE_CHANNELS = ("t", "session_time")
+
+_logger = logging.getLogger("telemetry")   # handlers : telemetry_store.get_logger()
+
+
+def frame_struct(channels) -> struct.Struct:
+    """Struct d'une trame pour une liste de canaux (u16 longueur + u32 seq + valeurs)."""
+    fmt = "<HI" + "".join("d" if c in _DOUBLE_CHANNELS else "f" for c in channels)
+    return struct.Struct(fmt)
+
+
+class _Subscriber:
+    __slots__ = ("sock", "addr", "channels", "every", "st", "queue",
+                 "event", "count", "sent", "dropped", "alive", "thread")
+
+    def __init__(self, sock, addr, channels, every, depth):
+        self.sock = sock
+        self.addr = addr
+        self.channels = tuple(channels)
+        self.every = max(1, int(every))
+        self.st = frame_struct(self.channels)
+        self.queue = collections.deque(maxlen=depth)
+        self.event = threading.Event()
+        self.count = 0
+        self.sent = 0
+        self.dropped = 0
+        self.alive = True
+        self.thread = None
+
+
+class FanoutServer:
+    """
+    Serveur de diffusion, branché sur telemetry_store comme listener :
+    on_append ne fait qu'empaqueter (une fois par jeu de canaux) et déposer
+    dans les files des abonnés.
+    """
+
+    def __init__(self, host: str = FANOUT_HOST, port: int = FANOUT_PORT,
+                 unix_path: str = FANOUT_UNIX):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self._subs = []           # copie remplacée à chaque (dés)abonnement
+        self._subs_lock = threading.Lock()
+        self._seq = 0
+        self._sock = None
+        self._stop = threading.Event()
+
+    # ---- Cycle de vie --------------------------------------------------
+    def start(self):
+        if self.unix_path and hasattr(socket, "AF_UNIX"):
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            srv.bind(self.unix_path)
+            where = self.unix_path
+        else:
+            srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            srv.bind((self.host, self.port))
+            self.port = srv.getsockname()[1]
+            where = f"{self.host}:{self.port}"
+        srv.listen(64)
+        self._sock = srv
+        threading.Thread(target=self._accept_loop, name="fanout-accept",
+                         daemon=True).start()
+        _logger.info("fanout: listening on %s", where)
+        return self
+
+    def stop(self):
+        remove_listener(self)
+        self._stop.set()
+        try:
+            self._sock.close()
+        except Exception:
+            pass
+        for sub in self._subs:
+            self._drop(sub)
+
+    def stats(self) -> list:
+        """Compteurs par abonné : envoyées / perdues / en file."""
+        return [{"addr": str(s.addr), "channels": list(s.channels), "every": s.every,
+                 "sent": s.sent, "dropped": s.dropped, "queued": len(s.queue)}
+                for s in self._subs]
+
+    # ---- Listener telemetry_store ------------------------------------
+    def on_append(self, p: dict):
+        subs = self._subs
+        if not subs:
+            return
+        self._seq = seq = (self._seq + 1) & 0xFFFFFFFF
+        packed = {}
+        for sub in subs:
+            sub.count += 1
+            if sub.count % sub.every:
+                continue
+            frame = packed.get(sub.channels)
+            if frame is None:
+                vals = []
+                for c in sub.channels:
+                    v = p.get(c)
+                    vals.append(math.nan if v is None else float(v))
+                frame = packed[sub.channels] = sub.st.pack(sub.st.size, seq, *vals)
+            q = sub.queue
+            if len(q) == q.maxlen:
+                sub.dropped += 1   # drop-oldest (deque bornée)
+            q.append(frame)
+            sub.event.set()
+
+    # ---- Connexions ----------------------------------------------------
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, addr = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handshake, args=(conn, addr),
+                             name="fanout-handshake", daemon=True).start()
+
+    def _handshake(self, conn, addr):
+        try:
+            conn.settimeout(5.0)
+            line = conn.makefile("rb").readline(4096)
+            req = json.loads(line or b"{}")
+            channels = [c for c in (req.get("channels") or FANOUT_CHANNELS)
+                        if c in FANOUT_CHANNELS] or FANOUT_CHANNELS
+            depth = min(MAX_QUEUE, max(1, int(req.get("queue", DEFAULT_QUEUE))))
+            sub = _Subscriber(conn, addr, channels, req.get("every", 1), depth)
+            conn.sendall((json.dumps({"channels": list(sub.channels),
+                                      "format": sub.st.format}) + "\n").encode("utf-8"))
+            conn.settimeout(None)
+            if conn.family == socket.AF_INET:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except Exception as e:
+            _logger.warning("fanout: handshake %s failed: %s", addr, e)
+            conn.close()
+            return
+        sub.thread = threading.Thread(target=self._sender, args=(sub,),
+                                      name="fanout-sender", daemon=True)
+        sub.thread.start()
+        with self._subs_lock:
+            self._subs = self._subs + [sub]
+        _logger.info("fanout: subscriber %s channels=%s every=%d queue=%d",
+                     addr, ",".join(sub.channels), sub.every, depth)
+
+    def _sender(self, sub):
+        q = sub.queue
+        while sub.alive and not self._stop.is_set():
+            sub.event.wait()
+            sub.event.clear()
+            batch = []
+            while q:
+                batch.append(q.popleft())
+            if not batch:
+                continue
+            try:
+                sub.sock.sendall(b"".join(batch))
+                sub.sent += len(batch)
+            except OSError:
+                break
+        self._drop(sub)
+
+    def _drop(self, sub):
+        if not sub.alive:
+            return
+        sub.alive = False
+        sub.event.set()
+        with self._subs_lock:
+            self._subs = [s for s in self._subs if s is not sub]
+        try:
+            sub.sock.close()
+        except Exception:
+            pass
+        _logger.info("fanout: subscriber %s gone (sent=%d dropped=%d)",
+                     sub.addr, sub.sent, sub.dropped)
+
+
+def start_fanout(port: int = FANOUT_PORT, unix_path: str = FANOUT_UNIX) -> FanoutServer:
+    """Démarre le serveur et le branche sur le store."""
+    server = FanoutServer(port=port, unix_path=unix_path).start()
+    add_listener(server)
+    return server
+
+
+def subscribe(channels=None, every: int = 1, queue: int = DEFAULT_QUEUE,
+              host: str = FANOUT_HOST, port: int = FANOUT_PORT, unix_path: str = ""):
+    """
+    Client minimal : générateur de dicts {canal: valeur, 'seq': n}.
+    Exemple : for p in subscribe(["speed", "lapDist"], every=3, port=20780): ...
+    """
+    if unix_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(unix_path)
+    else:
+        sock = socket.create_connection((host, port))
+    req = {"channels": channels or [], "every": every, "queue": queue}
+    sock.sendall((json.dumps(req) + "\n").encode("utf-8"))
+    fp = sock.makefile("rb")
+    hello = json.loads(fp.readline())
+    names = hello["channels"]
+    st = struct.Struct(hello["format"])
+    try:
+        while True:
+            data = fp.read(st.size)
+            if len(data) < st.size:
+                return
+            vals = st.unpack(data)
+            out = dict(zip(names, vals[2:]))
+            out["seq"] = vals[1]
+            yield out
+    finally:
+        sock.close()
@@ -0,0 +1,183 @@
+# lap_analytics.py
+import os
+import threading
+
+from lap_delta import START_MAX_DIST
+
+# --------- Config ---------
+BRAKE_ON = float(os.getenv("ANALYTICS_BRAKE_ON", "0.2"))        # début de freinage
+THROTTLE_ON = float(os.getenv("ANALYTICS_THROTTLE_ON", "0.5"))  # remise des gaz
+
+
+class _LapAccumulator:
+    """
+    Agrégats courants d'un tour, mis à jour en O(1) par échantillon.
+    Un "virage" = freinage (brake > BRAKE_ON) jusqu'à la remise des gaz
+    (throttle >= THROTTLE_ON sans frein).
+    """
+    __slots__ = ("lap", "n", "top_speed", "gear_shifts", "last_gear",
+                 "s1_ms", "s2_ms", "invalid", "last_t_ms", "first_dist",
+                 "corners", "corner")
+
+    def __init__(self, lap):
+        self.lap = lap
+        self.n = 0
+        self.top_speed = 0
+        self.gear_shifts = 0
+        self.last_gear = None
+        self.s1_ms = 0
+        self.s2_ms = 0
+        self.invalid = 0
+        self.last_t_ms = 0.0
+        self.first_dist = None
+        self.corners = []
+        self.corner = None   # virage en cours [brake_dist, min_speed, min_speed_dist]
+
+    def feed(self, p: dict):
+        speed = int(p.get("speed", 0) or 0)
+        brake = float(p.get("brake", 0.0) or 0.0)
+        throttle = float(p.get("throttle", 0.0) or 0.0)
+        gear = int(p.get("gear", 0) or 0)
+        dist = float(p.get("lapDist", 0.0) or 0.0)
+
+        self.n += 1
+        if self.first_dist is None:
+            self.first_dist = dist
+        if speed > self.top_speed:
+            self.top_speed = speed
+        if self.last_gear is not None and gear != self.last_gear:
+            self.gear_shifts += 1
+        self.last_gear = gear
+        if p.get("s1_ms"):
+            self.s1_ms = int(p["s1_ms"])
+        if p.get("s2_ms"):
+            self.s2_ms = int(p["s2_ms"])
+        if p.get("invalid"):
+            self.invalid = 1
+        self.last_t_ms = float(p.get("t_game_ms", 0.0) or 0.0)
+
+        braking = brake > BRAKE_ON
+        c = self.corner
+        if c is None:
+            if braking:
+                self.corner = [dist, speed, dist]
+        else:
+            if speed < c[1]:
+                c[1] = speed
+                c[2] = dist
+            if throttle >= THROTTLE_ON and not braking:
+                self.corners.append({
+                    "brake_dist": round(c[0], 1),
+                    "min_speed": c[1],
+                    "min_speed_dist": round(c[2], 1),
+                    "throttle_dist": round(dist, 1),
+                })
+                self.corner = None
+
+    def finalize(self, lap_ms=None, complete=False) -> dict:
+        """
+        Ligne compacte du tableau des tours. complete : le tour s'est terminé
+        par le passage au tour suivant ; il n'est retenu comme complet que
+        s'il part aussi de la ligne (pas le premier tour d'une capture
+        commencée en piste).
+        """
+        complete = int(complete and self.first_dist is not None
+                       and self.first_dist <= START_MAX_DIST)
+        lap_ms = int(lap_ms) if lap_ms else int(self.last_t_ms)
+        s3_ms = lap_ms - self.s1_ms - self.s2_ms if (self.s1_ms and self.s2_ms) else 0
+        return {
+            "lap": self.lap,
+            "lap_ms": lap_ms,
+            "s1_ms": self.s1_ms,
+            "s2_ms": self.s2_ms,
+            "s3_ms": max(0, s3_ms),
+            "invalid": self.invalid,
+            "complete": complete,
+            "top_speed": self.top_speed,
+            "gear_shifts": self.gear_shifts,
+            "corners": list(self.corners),
+            "points": self.n,
+        }
+
+
+class LapAnalytics:
+    """
+    Étage d'analyse incrémental alimenté par telemetry_store (add_listener).
+    Tour courant en agrégats O(1) ; tours terminés figés dans un tableau
+    lap -> ligne, interrogeable sans relire les points. Le tableau ne couvre
+    qu'une session : il est vidé quand session_uid change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = None
+        self._table = {}
+        self._session = None
+        self.version = 0   # incrémenté à chaque tour finalisé / flashback
+
+    def on_append(self, p: dict):
+        lap = p.get("lap")
+        if lap is None:
+            return
+        with self._lock:
+            session = p.get("session_uid")
+            if session != self._session:
+                # nouvelle session : le tour en cours de l'ancienne est abandonné
+                self._clear()
+                self._session = session
+            cur = self._current
+            if cur is None or lap != cur.lap:
+                if cur is not None and cur.n:
+                    # lastLapTimeInMS du nouveau tour = temps du tour terminé
+                    complete = (lap == cur.lap + 1)
+                    lap_ms = p.get("last_lap_ms") if complete else None
+                    self._table[cur.lap] = cur.finalize(lap_ms, complete)
+                    self.version += 1
+                cur = self._current = _LapAccumulator(lap)
+            cur.feed(p)
+
+    def on_rewind(self, buf, lap_tail):
+        """
+        Flashback : on oublie les tours finalisés après le point de reprise et
+        on rejoue les points survivants du tour courant (O(points du tour)).
+        """
+        with self._lock:
+            if not buf:
+                self._clear()
+                return
+            lap = buf[-1].get("lap")
+            for k in [k for k in self._table if k >= lap]:
+                del self._table[k]
+            cur = self._current = _LapAccumulator(lap)
+            for p in lap_tail:
+                cur.feed(p)
+            self.version += 1
+
+    def laps(self) -> list:
+        """Tableau des tours terminés (copie), triés par numéro."""
+        with self._lock:
+            return [dict(self._table[k]) for k in sorted(self._table)]
+
+    def lap(self, lap: int):
+        with self._lock:
+            row = self._table.get(lap)
+            return dict(row) if row else None
+
+    def current(self):
+        """Agrégats provisoires du tour en cours (None si aucun)."""
+        with self._lock:
+            return self._current.finalize() if self._current else None
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._session = None
+
+    def _clear(self):
+        self._current = None
+        self._table.clear()
+        self.version += 1
+
+
+# Instance partagée (capture + dashboard)
+lap_analytics = LapAnalytics()
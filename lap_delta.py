@@ -0,0 +1,160 @@
+# lap_delta.py
+import csv
+import os
+import threading
+
+# --------- Config ---------
+STEP_M = float(os.getenv("DELTA_STEP_M", "2"))   # pas de la table distance -> temps
+START_MAX_DIST = 50.0    # un tour de référence doit commencer près de la ligne
+
+
+class ReferenceLap:
+    """
+    Table distance -> temps à pas fixe (STEP_M) d'un tour de référence.
+    Construite une fois en O(n) ; time_at() est un accès direct O(1).
+    """
+
+    def __init__(self, samples, lap=None, lap_ms=None, source="live", step=STEP_M,
+                 session=None):
+        # samples : [(lapDist, t_game_ms), ...] dans l'ordre du tour
+        # session : session_uid du tour (None pour une archive)
+        self.lap = lap
+        self.source = source
+        self.session = session
+        self.step = step
+        pts = []
+        for d, t in samples:
+            if d < 0.0:
+                continue   # avant la ligne (outlap)
+            if pts and d <= pts[-1][0]:
+                continue   # distance non croissante (arrêt, bruit)
+            pts.append((float(d), float(t)))
+        if len(pts) < 2:
+            raise ValueError("ReferenceLap: pas assez de points")
+        self.lap_ms = float(lap_ms) if lap_ms else max(t for _, t in pts)
+        n = int(pts[-1][0] / step) + 1
+        times = [0.0] * n
+        j = 0
+        for k in range(n):
+            d = k * step
+            while j < len(pts) - 2 and pts[j + 1][0] < d:
+                j += 1
+            (d0, t0), (d1, t1) = pts[j], pts[j + 1]
+            if d <= d0:
+                times[k] = t0
+            else:
+                times[k] = t0 + (t1 - t0) * min(1.0, (d - d0) / (d1 - d0))
+        self.times = times
+        self.length = pts[-1][0]
+
+    def time_at(self, dist: float):
+        """Temps (ms) du tour de référence à la distance donnée, None hors table."""
+        if dist < 0.0 or dist > self.length:
+            return None
+        k = dist / self.step
+        i = int(k)
+        times = self.times
+        if i >= len(times) - 1:
+            return times[-1]
+        return times[i] + (times[i + 1] - times[i]) * (k - i)
+
+
+def load_reference_csv(path: str, lap: int) -> ReferenceLap:
+    """Tour de référence depuis un CSV de session (logs/telemetry_session_*.csv)."""
+    samples = []
+    with open(path, newline="", encoding="utf-8") as fp:
+        for row in csv.DictReader(fp):
+            if int(float(row["lap"])) != lap:
+                continue
+            samples.append((float(row["lapDist"]), float(row["t_game_ms"])))
+    return ReferenceLap(samples, lap=lap, source=path)
+
+
+class DeltaTracker:
+    """
+    Canal 'delta_ms' (temps du tour courant - temps de référence à la même
+    lapDistance) calculé à l'ingestion. Référence = meilleur tour valide de la
+    session, sauf si une référence épinglée a été chargée (archive). La
+    référence live est abandonnée quand session_uid change (autre piste).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ref = None
+        self.pinned = False
+        self._session = None
+        self._lap = None
+        self._samples = []
+        self._invalid = False
+
+    def set_reference(self, ref: ReferenceLap, pinned: bool = True):
+        with self._lock:
+            self.ref = ref
+            self.pinned = pinned
+
+    def annotate(self, p: dict):
+        """Ajoute p['delta_ms'] (ou None) avant append_point. O(1)."""
+        ref = self.ref
+        delta = None
+        if ref is not None and (self.pinned or ref.session == p.get("session_uid")):
+            t_ref = ref.time_at(float(p.get("lapDist", 0.0) or 0.0))
+            if t_ref is not None:
+                delta = float(p.get("t_game_ms", 0.0) or 0.0) - t_ref
+        p["delta_ms"] = delta
+        return delta
+
+    # ---- Listener telemetry_store ------------------------------------
+    def on_append(self, p: dict):
+        lap = p.get("lap")
+        if lap is None:
+            return
+        with self._lock:
+            session = p.get("session_uid")
+            if session != self._session:
+                self._session = session
+                self._lap = None
+                if not self.pinned:
+                    self.ref = None
+            if lap != self._lap:
+                if self._lap is not None and lap == self._lap + 1:
+                    self._close_lap(p.get("last_lap_ms"))
+                self._lap = lap
+                self._samples = []
+                self._invalid = False
+            if p.get("invalid"):
+                self._invalid = True
+            self._samples.append((float(p.get("lapDist", 0.0) or 0.0),
+                                  float(p.get("t_game_ms", 0.0) or 0.0)))
+
+    def on_rewind(self, buf, lap_tail):
+        with self._lock:
+            self._samples = []
+            self._invalid = False
+            self._lap = buf[-1].get("lap") if buf else None
+            ref = self.ref
+            if (ref is not None and not self.pinned and ref.session == self._session
+                    and self._lap is not None and ref.lap is not None and ref.lap >= self._lap):
+                self.ref = None   # tour de référence effacé par le flashback
+            for p in lap_tail:
+                if p.get("invalid"):
+                    self._invalid = True
+                self._samples.append((float(p.get("lapDist", 0.0) or 0.0),
+                                      float(p.get("t_game_ms", 0.0) or 0.0)))
+
+    def _close_lap(self, lap_ms):
+        """Tour terminé : devient la référence s'il bat le meilleur valide."""
+        if self._invalid or not lap_ms or not self._samples:
+            return
+        if self._samples[0][0] > START_MAX_DIST:
+            return   # tour partiel
+        if self.pinned or (self.ref is not None and lap_ms >= self.ref.lap_ms):
+            return
+        try:
+            self.ref = ReferenceLap(self._samples, lap=self._lap, lap_ms=lap_ms,
+                                    session=self._session)
+        except ValueError:
+            pass
+
+
+# Instance partagée (capture + dashboard)
+delta_tracker = DeltaTracker()
@@ -0,0 +1,123 @@
+# packet_router.py
+"""
+Routage des paquets UDP F1 25 par abonnement.
+
+Seuls packetId (offset 6) et playerCarIndex (offset 27) de l'en-tête sont
+lus (struct.unpack_from, sans copie) : un type de paquet sans abonné est
+compté puis ignoré, sans construire PacketHeader ni l'objet paquet. Les
+types abonnés sont décodés une seule fois (f1_parser.parse_packet), puis
+remis à chaque consommateur.
+
+    router = PacketRouter()
+    router.subscribe(PacketId.LAP_DATA, on_lap)                  # objet décodé
+    router.subscribe(PacketId.EVENT, on_raw, decode=False)       # octets bruts
+    router.route(data)
+"""
+import logging
+import struct
+
+from f1_parser import PacketId, parse_packet
+
+HEADER_SIZE = 29
+_PACKET_ID = struct.Struct("<B")     # offset 6
+_PLAYER_IDX = struct.Struct("<B")    # offset 27
+PACKET_ID_OFFSET = 6
+PLAYER_IDX_OFFSET = 27
+
+PACKET_NAMES = {v: k for k, v in vars(PacketId).items() if not k.startswith("_")}
+
+_logger = logging.getLogger("telemetry")   # handlers : telemetry_store.get_logger()
+
+
+class _Route:
+    __slots__ = ("handler", "name", "decode", "player", "delivered", "errors")
+
+    def __init__(self, handler, name, decode, player):
+        self.handler = handler
+        self.name = name
+        self.decode = decode
+        self.player = player
+        self.delivered = 0
+        self.errors = 0
+
+
+class PacketRouter:
+    """
+    Table packetId -> consommateurs. Un consommateur reçoit soit le paquet
+    décodé (decode=True), soit (data, player_idx) pour lire lui-même
+    quelques champs à offset fixe. player : ne router que si
+    playerCarIndex vaut cet index (None => tous).
+    """
+
+    def __init__(self):
+        self._routes = {}         # packet_id -> [_Route]
+        self.received = {}        # packet_id -> nb reçus
+        self.skipped = 0          # sans abonné (ou filtrés par player) : ni décodés ni routés
+        self.short = 0            # plus courts que l'en-tête
+        self.undecoded = 0        # parse_packet -> None (type non implémenté / struct.error)
+
+    def subscribe(self, packet_id: int, handler, name: str = None,
+                  decode: bool = True, player: int = None):
+        route = _Route(handler, name or getattr(handler, "__name__", "route"),
+                       decode, player)
+        self._routes.setdefault(packet_id, []).append(route)
+        return route
+
+    def unsubscribe(self, packet_id: int, handler):
+        routes = [r for r in self._routes.get(packet_id, []) if r.handler is not handler]
+        if routes:
+            self._routes[packet_id] = routes
+        else:
+            self._routes.pop(packet_id, None)
+
+    def route(self, data: bytes) -> bool:
+        """Route un datagramme ; False si remis à aucune route."""
+        if len(data) < HEADER_SIZE:
+            self.short += 1
+            return False
+        pid = _PACKET_ID.unpack_from(data, PACKET_ID_OFFSET)[0]
+        self.received[pid] = self.received.get(pid, 0) + 1
+        routes = self._routes.get(pid)
+        if not routes:
+            self.skipped += 1
+            return False
+        player_idx = _PLAYER_IDX.unpack_from(data, PLAYER_IDX_OFFSET)[0]
+        packet = None
+        decoded = matched = routed = False
+        for r in routes:
+            if r.player is not None and r.player != player_idx:
+                continue
+            matched = True
+            if r.decode:
+                if not decoded:
+                    decoded = True
+                    packet = parse_packet(data)
+                    if packet is None:
+                        self.undecoded += 1
+                if packet is None:
+                    continue   # les routes brutes sont servies quand même
+                arg = (packet,)
+            else:
+                arg = (data, player_idx)
+            routed = True
+            try:
+                r.handler(*arg)
+                r.delivered += 1
+            except Exception as e:
+                r.errors += 1
+                _logger.error("route %s ERROR: %s", r.name, e, exc_info=True)
+        if not matched:
+            self.skipped += 1   # toutes les routes filtrées par player
+        return routed
+
+    def stats(self) -> dict:
+        """Compteurs : reçus par type, ignorés, et livrés / erreurs par route."""
+        return {
+            "received": {PACKET_NAMES.get(k, str(k)): v for k, v in sorted(self.received.items())},
+            "skipped": self.skipped,
+            "short": self.short,
+            "undecoded": self.undecoded,
+            "routes": [{"packet": PACKET_NAMES.get(pid, str(pid)), "name": r.name,
+                        "delivered": r.delivered, "errors": r.errors}
+                       for pid, routes in sorted(self._routes.items()) for r in routes],
+        }
@@ -0,0 +1,388 @@
+# session_catalog.py
+import contextlib
+import csv
+import io
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from lap_delta import START_MAX_DIST
+from telemetry_store import LOG_DIR, get_logger
+
+# --------- Config ---------
+CATALOG_PATH = os.path.join(LOG_DIR, "catalog.sqlite")
+# Colonnes des CSV de session (mêmes en-têtes que logs/telemetry_session_*.csv)
+ARCHIVE_COLUMNS = ["t", "t_game_ms", "lap", "lapDist", "invalid",
+                   "speed", "rpm", "gear", "throttle", "brake"]
+RAIN_WEATHER = (3, 4, 5)   # light rain, heavy rain, storm
+BACKWARD_TOL_M = 1.0       # recul de lapDist toléré (bruit) avant de couper une plage
+
+_logger = logging.getLogger("telemetry")   # handlers : telemetry_store.get_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_uid  TEXT PRIMARY KEY,
+    started      REAL,
+    track_id     INTEGER,
+    session_type INTEGER,
+    team_id      INTEGER,
+    weather      INTEGER,
+    archive      TEXT
+);
+CREATE TABLE IF NOT EXISTS laps (
+    session_uid TEXT,
+    lap         INTEGER,
+    lap_ms      INTEGER,
+    valid       INTEGER,
+    weather     INTEGER,
+    s1_ms       INTEGER,
+    s2_ms       INTEGER,
+    s3_ms       INTEGER,
+    top_speed   INTEGER,
+    rows        INTEGER,
+    offset      INTEGER,
+    nbytes      INTEGER,
+    PRIMARY KEY (session_uid, lap)
+);
+CREATE INDEX IF NOT EXISTS laps_by_time ON laps(lap_ms);
+CREATE INDEX IF NOT EXISTS sessions_by_track ON sessions(track_id, started);
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@contextlib.contextmanager
+def _open(path: str):
+    """Connexion courte : commit en sortie puis fermeture."""
+    conn = _connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _encode_rows(points) -> bytes:
+    out = io.StringIO()
+    w = csv.writer(out, lineterminator="\n")
+    for p in points:
+        w.writerow([p.get(c, "") for c in ARCHIVE_COLUMNS])
+    return out.getvalue().encode("utf-8")
+
+
+class Catalog:
+    """
+    Requêtes sur les sessions archivées. Les réponses viennent uniquement de
+    l'index SQLite ; les canaux d'un tour ne sont lus (seek + lecture de sa
+    plage d'octets dans le CSV) que sur demande via load_lap().
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+
+    def sessions(self) -> list:
+        with _open(self.path) as conn:
+            rows = conn.execute("SELECT * FROM sessions ORDER BY started DESC")
+            return [dict(r) for r in rows]
+
+    def laps(self, track_id=None, session_type=None, team_id=None,
+             valid=None, max_ms=None, rain=None, since=None, limit=None) -> list:
+        """
+        Tours triés par temps. since : timestamp (s) minimal du début de
+        session ; rain : True/False pour filtrer sur la météo du tour.
+        """
+        where, args = ["l.lap_ms > 0"], []
+        if track_id is not None:
+            where.append("s.track_id = ?")
+            args.append(track_id)
+        if session_type is not None:
+            where.append("s.session_type = ?")
+            args.append(session_type)
+        if team_id is not None:
+            where.append("s.team_id = ?")
+            args.append(team_id)
+        if valid is not None:
+            where.append("l.valid = ?")
+            args.append(1 if valid else 0)
+        if max_ms is not None:
+            where.append("l.lap_ms < ?")
+            args.append(int(max_ms))
+        if rain is not None:
+            marks = ",".join("?" * len(RAIN_WEATHER))
+            if rain:
+                where.append(f"l.weather IN ({marks})")
+            else:   # météo inconnue (CSV importés) : comptée comme sèche
+                where.append(f"(l.weather IS NULL OR l.weather NOT IN ({marks}))")
+            args.extend(RAIN_WEATHER)
+        if since is not None:
+            where.append("s.started >= ?")
+            args.append(float(since))
+        sql = ("SELECT l.*, s.track_id, s.session_type, s.team_id, s.started, s.archive "
+               "FROM laps l JOIN sessions s USING (session_uid) "
+               f"WHERE {' AND '.join(where)} ORDER BY l.lap_ms")
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with _open(self.path) as conn:
+            return [dict(r) for r in conn.execute(sql, args)]
+
+    def best_lap(self, **filters):
+        """Meilleur tour valide correspondant aux filtres (None si aucun)."""
+        filters["valid"] = True
+        rows = self.laps(limit=1, **filters)
+        return rows[0] if rows else None
+
+    def load_lap(self, session_uid: str, lap: int, channels=None) -> dict:
+        """Canaux d'un tour (colonnes -> listes), lus à la demande depuis l'archive."""
+        with _open(self.path) as conn:
+            row = conn.execute(
+                "SELECT l.offset, l.nbytes, s.archive FROM laps l "
+                "JOIN sessions s USING (session_uid) "
+                "WHERE l.session_uid = ? AND l.lap = ?", (str(session_uid), lap)).fetchone()
+        if row is None:
+            raise KeyError(f"lap inconnu: {session_uid}/{lap}")
+        with open(row["archive"], "rb") as fp:
+            header = next(csv.reader([fp.readline().decode("utf-8")]))
+            fp.seek(row["offset"])
+            chunk = fp.read(row["nbytes"]).decode("utf-8")
+        cols = channels or header
+        idx = [header.index(c) for c in cols]
+        out = {c: [] for c in cols}
+        for rec in csv.reader(io.StringIO(chunk)):
+            for c, i in zip(cols, idx):
+                out[c].append(float(rec[i]) if rec[i] != "" else None)
+        return out
+
+    def index_csv(self, path: str) -> int:
+        """
+        Indexe un CSV de session existant (sans métadonnées de session :
+        piste/type inconnus = -1). Une plage contiguë de lignes par tour ; une
+        plage est aussi coupée quand t_game_ms ou lapDist recule (flashback,
+        restart). Un tour n'est valide que s'il part de la ligne
+        (lapDist <= START_MAX_DIST) et que la plage suivante est le tour
+        suivant ; lap_ms = dernier t_game_ms de la plage (pas de last_lap_ms
+        dans le CSV). Retourne le nombre de tours indexés.
+        """
+        uid = "csv:" + os.path.basename(path)
+        laps, run = [], None
+        with open(path, "rb") as fp:
+            header = next(csv.reader([fp.readline().decode("utf-8")]))
+            col = {c: header.index(c)
+                   for c in ("t", "t_game_ms", "lap", "lapDist", "invalid", "speed")}
+            offset = fp.tell()
+            started = None
+            for line in fp:
+                rec = next(csv.reader([line.decode("utf-8")]))
+                lap = int(float(rec[col["lap"]]))
+                t_game = float(rec[col["t_game_ms"]])
+                dist = float(rec[col["lapDist"]])
+                if started is None:
+                    started = float(rec[col["t"]])
+                if (run is None or run["lap"] != lap or t_game < run["t_last"]
+                        or dist < run["d_last"] - BACKWARD_TOL_M):
+                    if run is not None and lap == run["lap"] + 1:
+                        run["complete"] = True
+                    run = {"lap": lap, "offset": offset, "nbytes": 0, "rows": 0,
+                           "lap_ms": 0, "invalid": False, "top_speed": 0,
+                           "d_first": dist, "complete": False}
+                    laps.append(run)
+                run["t_last"] = t_game
+                run["d_last"] = dist
+                run["nbytes"] += len(line)
+                run["rows"] += 1
+                run["lap_ms"] = int(t_game)
+                run["top_speed"] = max(run["top_speed"], int(float(rec[col["speed"]])))
+                if int(float(rec[col["invalid"]])):
+                    run["invalid"] = True
+                offset += len(line)
+        for r in laps:
+            r["valid"] = int(r["complete"] and not r["invalid"]
+                             and r["d_first"] <= START_MAX_DIST)
+        with _open(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions VALUES (?,?,?,?,?,?,?)",
+                         (uid, started or 0.0, -1, -1, -1, None, os.path.abspath(path)))
+            for r in laps:   # un tour rejoué (flashback) : la dernière plage gagne
+                conn.execute(
+                    "INSERT OR REPLACE INTO laps VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                    (uid, r["lap"], r["lap_ms"], r["valid"], None, 0, 0, 0,
+                     r["top_speed"], r["rows"], r["offset"], r["nbytes"]))
+        return len(laps)
+
+
+class SessionRecorder:
+    """
+    Archive les tours terminés de la timeline (après coupes de flashback) dans
+    un CSV par session et les indexe dans le catalogue. Listener
+    telemetry_store : on_append ne fait que garder une référence au point ;
+    l'écriture disque se fait dans un thread dédié.
+    """
+
+    def __init__(self, catalog_path: str = CATALOG_PATH, log_dir: str = LOG_DIR):
+        self.catalog_path = catalog_path
+        self.log_dir = log_dir
+        self._lock = threading.Lock()
+        self._meta = {}          # session_uid -> dict (piste, type, météo...)
+        self._uid = None
+        self._lap = None
+        self._points = []
+        self._lap_weather = None
+        self._queue = queue.Queue()
+        self._thread = None
+
+    # ---- Paquets Session / Participants ------------------------------
+    def on_session(self, pkt):
+        uid = str(pkt.header.sessionUID)
+        with self._lock:
+            meta = self._meta.setdefault(uid, {"started": time.time(), "team_id": -1})
+            meta.update(track_id=pkt.trackId, session_type=pkt.sessionType,
+                        weather=pkt.weather)
+            if uid == self._uid:
+                self._lap_weather = max(self._lap_weather or 0, pkt.weather)
+
+    def on_participants(self, pkt):
+        uid = str(pkt.header.sessionUID)
+        idx = pkt.header.playerCarIndex
+        if idx >= len(pkt.participants):
+            return
+        with self._lock:
+            meta = self._meta.setdefault(uid, {"started": time.time(), "team_id": -1})
+            meta["team_id"] = pkt.participants[idx].teamId
+
+    # ---- Listener telemetry_store ------------------------------------
+    def on_append(self, p: dict):
+        lap = p.get("lap")
+        if lap is None:
+            return
+        uid = str(p.get("session_uid"))
+        with self._lock:
+            if uid != self._uid or lap != self._lap:
+                if self._points and uid == self._uid:
+                    complete = (lap == self._lap + 1)
+                    self._close_lap(p.get("last_lap_ms") if complete else None, complete)
+                self._uid = uid
+                self._lap = lap
+                self._points = []
+                self._lap_weather = self._meta.get(uid, {}).get("weather")
+            self._points.append(p)
+
+    def on_rewind(self, buf, lap_tail):
+        with self._lock:
+            self._points = list(lap_tail)
+            if buf:
+                self._lap = buf[-1].get("lap")
+
+    def _close_lap(self, lap_ms, complete):
+        """
+        Archive le tour courant. Valide seulement s'il est complet (suivi du
+        tour suivant) et que ses points partent de la ligne : le premier tour
+        d'une capture commencée en piste n'a qu'une partie des lignes.
+        """
+        pts = self._points
+        s1 = max(int(p.get("s1_ms", 0) or 0) for p in pts)
+        s2 = max(int(p.get("s2_ms", 0) or 0) for p in pts)
+        lap_ms = int(lap_ms or max(float(p.get("t_game_ms", 0.0) or 0.0) for p in pts))
+        summary = {
+            "lap": self._lap,
+            "lap_ms": lap_ms,
+            "valid": int(complete and not any(p.get("invalid") for p in pts)
+                         and float(pts[0].get("lapDist", 0.0) or 0.0) <= START_MAX_DIST),
+            "weather": self._lap_weather,
+            "s1_ms": s1,
+            "s2_ms": s2,
+            "s3_ms": max(0, lap_ms - s1 - s2) if (s1 and s2) else 0,
+            "top_speed": max(int(p.get("speed", 0) or 0) for p in pts),
+        }
+        meta = dict(self._meta.get(self._uid, {"started": time.time(), "team_id": -1}))
+        self._ensure_writer()
+        self._queue.put((self._uid, meta, summary, pts))
+
+    # ---- Écriture (thread dédié) ---------------------------------------
+    def _ensure_writer(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._writer, name="session-recorder", daemon=True)
+            self._thread.start()
+
+    def _writer(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        conn = _connect(self.catalog_path)
+        archives = {}
+        while True:
+            uid, meta, summary, pts = self._queue.get()
+            try:
+                path = archives.get(uid)
+                if path is None:
+                    row = conn.execute("SELECT archive FROM sessions WHERE session_uid = ?",
+                                       (uid,)).fetchone()
+                    if row is not None:
+                        path = row["archive"]
+                    else:
+                        stamp = time.strftime("%Y%m%d_%H%M%S",
+                                              time.localtime(meta.get("started", time.time())))
+                        path = os.path.abspath(os.path.join(
+                            self.log_dir, f"telemetry_session_{stamp}.csv"))
+                    archives[uid] = path
+                data = _encode_rows(pts)
+                new_file = not os.path.exists(path)
+                with open(path, "ab") as fp:
+                    if new_file:
+                        fp.write((",".join(ARCHIVE_COLUMNS) + "\n").encode("utf-8"))
+                    offset = fp.tell()
+                    fp.write(data)
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sessions VALUES (?,?,?,?,?,?,?)",
+                        (uid, meta.get("started"), meta.get("track_id", -1),
+                         meta.get("session_type", -1), meta.get("team_id", -1),
+                         meta.get("weather"), path))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO laps VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                        (uid, summary["lap"], summary["lap_ms"], summary["valid"],
+                         summary["weather"], summary["s1_ms"], summary["s2_ms"],
+                         summary["s3_ms"], summary["top_speed"], len(pts), offset, len(data)))
+                _logger.info("session_recorder: lap %s archived (%s, %d rows)",
+                             summary["lap"], path, len(pts))
+            except Exception as e:
+                _logger.error("session_recorder ERROR: %s", e, exc_info=True)
+
+
+# Instance partagée (capture)
+session_recorder = SessionRecorder()
+
+
+def _main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Catalogue des sessions archivées")
+    ap.add_argument("--index", nargs="*", default=[], help="CSV de session à indexer")
+    ap.add_argument("--track", type=int, help="trackId")
+    ap.add_argument("--under", type=float, help="tours sous X secondes")
+    ap.add_argument("--rain", action="store_true", help="tours sous la pluie")
+    ap.add_argument("--days", type=float, help="sessions des N derniers jours")
+    args = ap.parse_args()
+    get_logger()
+
+    cat = Catalog()
+    for path in args.index:
+        print(f"{path}: {cat.index_csv(path)} tours indexés")
+    since = time.time() - args.days * 86400 if args.days else None
+    t0 = time.perf_counter()
+    rows = cat.laps(track_id=args.track, valid=True, since=since,
+                    max_ms=args.under * 1000 if args.under else None,
+                    rain=True if args.rain else None, limit=20)
+    dt = (time.perf_counter() - t0) * 1000.0
+    for r in rows:
+        print(f"{r['session_uid']:>24} lap {r['lap']:>3} {r['lap_ms'] / 1000.0:9.3f} s "
+              f"track={r['track_id']} type={r['session_type']} weather={r['weather']}")
+    print(f"{len(rows)} tours ({dt:.1f} ms)")
+
+
+if __name__ == "__main__":
+    _main()
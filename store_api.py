@@ -0,0 +1,111 @@
+# store_api.py
+"""
+API HTTP (JSON) du process de capture, lue par les workers Dash
+(store_client.RemoteSource) :
+
+    GET /points?start=N&limit=M&rewinds=R   points de la timeline depuis l'index N
+    GET /laps[?version=V]                   tableau lap_analytics (vide si à jour)
+    GET /trackmap[?channel=speed]           tracé + heat-map + voitures
+    GET /trackmap/versions | /trackmap/heat | /trackmap/cars
+    GET /delta_ref                          tour de référence du delta
+    GET /dump                               dump_snapshot()
+    GET /export/<fmt>?laps=..&t0=..&t1=     export en flux (telemetry_export)
+
+    python capture_headless.py --api 8765
+    TELEMETRY_SOURCE=http://127.0.0.1:8765 gunicorn -w 4 -b 127.0.0.1:8050 dash_fi:server
+"""
+import json
+import logging
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from store_client import LocalSource
+
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+
+_logger = logging.getLogger("telemetry")   # handlers : telemetry_store.get_logger()
+_source = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):   # pas de sortie stderr par requête
+        pass
+
+    def _json(self, obj, status=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        q = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+        try:
+            if path == "/points":
+                rewinds = q.get("rewinds")
+                start, pts, stat = _source.points_since(
+                    int(q.get("start", 0)), int(q.get("limit", 20000)),
+                    int(rewinds) if rewinds is not None else None)
+                self._json({"start": start, "points": pts, "stat": stat})
+            elif path == "/laps":
+                version = q.get("version")
+                self._json(_source.laps(int(version) if version is not None else None))
+            elif path == "/trackmap":
+                self._json(_source.track_full(q.get("channel", "speed")))
+            elif path == "/trackmap/versions":
+                self._json(_source.track_versions())
+            elif path == "/trackmap/heat":
+                self._json(_source.track_heat(q.get("channel", "speed")))
+            elif path == "/trackmap/cars":
+                self._json(_source.track_cars())
+            elif path == "/delta_ref":
+                self._json(_source.delta_ref())
+            elif path == "/dump":
+                self._json({"path": _source.dump()})
+            elif path.startswith("/export/"):
+                self._export(path.rsplit("/", 1)[-1], q)
+            else:
+                self._json({"error": f"inconnu: {path}"}, status=404)
+        except (ValueError, KeyError) as e:
+            self._json({"error": str(e)}, status=400)
+        except Exception as e:
+            _logger.error("store_api %s ERROR: %s", self.path, e, exc_info=True)
+            self._json({"error": str(e)}, status=500)
+
+    def _export(self, fmt, q):
+        laps = [int(v) for v in q.get("laps", "").split(",") if v.strip()]
+        t0, t1 = q.get("t0"), q.get("t1")
+        t_range = (float(t0) if t0 else None, float(t1) if t1 else None) if (t0 or t1) else None
+        gen = _source.export_stream(fmt, laps=laps, t_range=t_range)
+        first = next(gen, b"")   # erreur avant l'en-tête => réponse JSON de do_GET
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.end_headers()
+        # HTTP/1.0 : fin du corps = fermeture de la connexion. Une erreur en
+        # cours de flux ne peut plus changer le statut : on coupe la connexion
+        # (corps tronqué) au lieu d'écrire une 2e réponse dans le corps.
+        try:
+            self.wfile.write(first)
+            for data in gen:
+                self.wfile.write(data)
+        except Exception as e:
+            _logger.error("store_api export %s ERROR: %s", fmt, e, exc_info=True)
+            self.close_connection = True
+        finally:
+            gen.close()
+
+
+def start_api(port: int = API_PORT, host: str = API_HOST) -> ThreadingHTTPServer:
+    """Démarre l'API dans un thread (process de capture)."""
+    global _source
+    _source = LocalSource()
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="store-api", daemon=True).start()
+    _logger.info("store_api: listening on %s:%d", host, port)
+    return server
@@ -0,0 +1,288 @@
+# store_client.py
+"""
+Accès du dashboard aux données de capture, en local (même process que la
+capture) ou à distance via l'API HTTP du process de capture (store_api.py).
+Permet de servir Dash avec plusieurs workers : chaque worker garde un miroir
+incrémental de la timeline, l'état de rendu est par onglet (dcc.Store).
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+POINTS_PAGE = 20000        # points par requête de rattrapage
+MIN_REFRESH_S = 0.2        # plusieurs onglets d'un même worker partagent un refresh
+EXPORT_READ_BYTES = 65536
+
+
+class LocalSource:
+    """Lecture directe des objets du process de capture."""
+
+    def __init__(self):
+        import telemetry_store
+        from lap_analytics import lap_analytics
+        from track_map import track_map
+        from lap_delta import delta_tracker
+        self._store = telemetry_store
+        self._analytics = lap_analytics
+        self._track = track_map
+        self._delta = delta_tracker
+
+    def points_since(self, start, limit=POINTS_PAGE, rewinds_seen=None):
+        return self._store.points_since(start, limit, rewinds_seen)
+
+    def laps(self, known_version=None):
+        """Tableau des tours ; laps=None si la version connue est à jour."""
+        v = self._analytics.version
+        return {"version": v, "laps": None if v == known_version else self._analytics.laps()}
+
+    def track_versions(self):
+        t = self._track
+        return {"outline": t.outline_version, "heat": t.heat_version, "cars": t.cars_version}
+
+    def track_full(self, channel):
+        t = self._track
+        cars, player_idx = t.cars_snapshot()
+        return {"outline": list(t.outline), "bins": list(t.outline_bins),
+                "heat": t.heat(channel), "cars": cars, "player_idx": player_idx}
+
+    def track_heat(self, channel):
+        return {"heat": self._track.heat(channel)}
+
+    def track_cars(self):
+        cars, player_idx = self._track.cars_snapshot()
+        return {"cars": cars, "player_idx": player_idx}
+
+    def delta_ref(self):
+        ref = self._delta.ref
+        if ref is None:
+            return None
+        return {"lap": ref.lap, "lap_ms": ref.lap_ms, "source": ref.source,
+                "session": ref.session, "pinned": self._delta.pinned}
+
+    def dump(self):
+        return self._store.dump_snapshot(max_points=30000, filename_prefix="snapshot_manual")
+
+    def export_stream(self, fmt, laps=None, t_range=None):
+        """
+        Itérateur d'octets de l'export (telemetry_export). Parquet/Arrow
+        passent par un fichier temporaire, supprimé après envoi.
+        """
+        from telemetry_export import check_format, export_to_file, iter_chunks, iter_csv, iter_raw
+        check_format(fmt)
+        if fmt in ("csv", "raw"):
+            chunks = iter_chunks(laps=laps, t_range=t_range)
+            return iter_csv(chunks) if fmt == "csv" else iter_raw(chunks)
+        fd, tmp = tempfile.mkstemp(prefix="telemetry_export_", suffix="." + fmt)
+        os.close(fd)
+        if not export_to_file(fmt, path=tmp, laps=laps, t_range=t_range):
+            os.unlink(tmp)
+            raise RuntimeError("export: erreur (voir logs)")
+        return _iter_file(tmp, remove=True)
+
+
+def _iter_file(path, remove=False):
+    try:
+        with open(path, "rb") as fp:
+            while True:
+                data = fp.read(EXPORT_READ_BYTES)
+                if not data:
+                    return
+                yield data
+    finally:
+        if remove:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+class RemoteSource:
+    """Même interface que LocalSource, via l'API HTTP du process de capture."""
+
+    def __init__(self, base_url: str, timeout: float = 5.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        params = {k: v for k, v in params.items() if v is not None}
+        url = f"{self.base_url}{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+            return json.loads(resp.read())
+
+    def points_since(self, start, limit=POINTS_PAGE, rewinds_seen=None):
+        r = self._get("/points", start=start, limit=limit, rewinds=rewinds_seen)
+        return r["start"], r["points"], r["stat"]
+
+    def laps(self, known_version=None):
+        return self._get("/laps", version=known_version)
+
+    def track_versions(self):
+        return self._get("/trackmap/versions")
+
+    def track_full(self, channel):
+        return self._get("/trackmap", channel=channel)
+
+    def track_heat(self, channel):
+        return self._get("/trackmap/heat", channel=channel)
+
+    def track_cars(self):
+        return self._get("/trackmap/cars")
+
+    def delta_ref(self):
+        return self._get("/delta_ref")
+
+    def dump(self):
+        return self._get("/dump").get("path", "")
+
+    def export_stream(self, fmt, laps=None, t_range=None):
+        params = {}
+        if laps:
+            params["laps"] = ",".join(str(int(v)) for v in laps)
+        if t_range:
+            if t_range[0] is not None:
+                params["t0"] = t_range[0]
+            if t_range[1] is not None:
+                params["t1"] = t_range[1]
+        url = f"{self.base_url}/export/{fmt}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        resp = urllib.request.urlopen(url, timeout=None)
+
+        def gen():
+            with resp:
+                while True:
+                    data = resp.read(EXPORT_READ_BYTES)
+                    if not data:
+                        return
+                    yield data
+        return gen()
+
+
+def make_source(spec: str = None):
+    """TELEMETRY_SOURCE : vide => capture locale ; "http://host:port" => API distante."""
+    spec = os.getenv("TELEMETRY_SOURCE", "") if spec is None else spec
+    return RemoteSource(spec) if spec else LocalSource()
+
+
+class TimelineMirror:
+    """
+    Copie incrémentale de la timeline dans le process Dash, indexée par lap :
+    lap -> [index_début, index_fin, segment] (plage contiguë, les flashbacks
+    étant coupés par le store). Le n° de segment change dès qu'une plage est
+    recréée ou coupée : (lap, segment, fin) identifie un contenu. Seule la
+    session courante est gardée : un nouveau session_uid repart de zéro.
+    Partagée par les onglets d'un worker, protégée par un verrou ; seul
+    l'état de rendu est propre à chaque onglet.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._lock = threading.Lock()
+        self.rewinds = None
+        self.stat = {}
+        self._last_refresh = 0.0
+        self._seg_seq = 0
+        self._reset(0)
+
+    def _reset(self, base):
+        self.base = base
+        self.points = []
+        self.laps = {}
+        self._last_lap = None
+        self._session = None
+
+    @property
+    def end(self):
+        return self.base + len(self.points)
+
+    def refresh(self):
+        """Récupère les nouveaux points (et applique les coupes de flashback)."""
+        with self._lock:
+            now = time.time()
+            if now - self._last_refresh < MIN_REFRESH_S:
+                return self.stat
+            self._last_refresh = now
+            while True:
+                start, pts, stat = self.source.points_since(
+                    self.end, POINTS_PAGE, self.rewinds)
+                self.rewinds = stat.get("rewinds", 0)
+                if start < self.end:
+                    self._truncate(start)
+                elif start > self.end:
+                    self._reset(start)   # points évincés (TELEMETRY_MAXLEN)
+                self._extend(pts)
+                self.stat = stat
+                if len(pts) < POINTS_PAGE:
+                    return stat
+
+    def _truncate(self, k):
+        if k <= self.base:
+            self._reset(k)
+            return
+        del self.points[k - self.base:]
+        for lap, rng in list(self.laps.items()):
+            if rng[0] >= k:
+                del self.laps[lap]
+            elif rng[1] > k:
+                rng[1] = k
+                rng[2] = self._next_seg()
+        self._last_lap = self.points[-1].get("lap") if self.points else None
+
+    def _next_seg(self):
+        self._seg_seq += 1
+        return self._seg_seq
+
+    def _extend(self, pts):
+        i = self.end
+        for p in pts:
+            session = p.get("session_uid")
+            if session is not None and session != self._session:
+                if self._session is not None:
+                    self._reset(i)   # nouvelle session : les n° de tour repartent de 1
+                self._session = session
+            lap = p.get("lap")
+            if lap is not None:
+                rng = self.laps.get(lap)
+                if lap != self._last_lap or rng is None:
+                    self.laps[lap] = [i, i + 1, self._next_seg()]   # plage neuve
+                    self._last_lap = lap
+                else:
+                    rng[1] = i + 1
+            self.points.append(p)
+            i += 1
+
+    def lap_keys(self):
+        with self._lock:
+            return sorted(self.laps)
+
+    def lap_points(self, lap):
+        with self._lock:
+            rng = self.laps.get(lap)
+            if rng is None:
+                return []
+            return self.points[rng[0] - self.base:rng[1] - self.base]
+
+    def lap_slice(self, lap):
+        """(points, (segment, fin)) du lap, lus sous le même verrou."""
+        with self._lock:
+            rng = self.laps.get(lap)
+            if rng is None:
+                return [], None
+            return self.points[rng[0] - self.base:rng[1] - self.base], (rng[2], rng[1])
+
+    def segments(self):
+        with self._lock:
+            return {(lap, rng[2]) for lap, rng in self.laps.items()}
+
+    def last_point(self):
+        with self._lock:
+            return self.points[-1] if self.points else None
+
+    def __len__(self):
+        return len(self.points)
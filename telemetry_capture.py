@@ -1,18 +1,49 @@
 
 # telemetry_capture.py
+import logging
+import os
 import socket
-import sys
 import time
-from f1_parser import parse_packet, PacketCarTelemetryData, PacketLapData
-from telemetry_store import append_point, get_logger
+from f1_parser import PacketId
+from packet_router import PacketRouter
+from telemetry_store import append_point, add_listener, get_logger
+from lap_analytics import lap_analytics
+from track_map import track_map
+from lap_delta import delta_tracker
+from session_catalog import session_recorder
+from console_status import ConsoleStatus
 
 UDP_IP = "0.0.0.0"
 UDP_PORT = 20777
-_logger = get_logger()
+RECV_TIMEOUT_S = 0.5   # recv bloquant : réveil périodique (Ctrl+C, PPS)
+PRINT_HZ = 20          # console seulement
+_logger = logging.getLogger("telemetry")   # handlers : telemetry_store.get_logger()
 
 
-def run_capture():
-    """Boucle de capture UDP F1 25 -> append_point(...) + statut console."""
+def run_capture(ip: str = UDP_IP, port: int = UDP_PORT, fanout_port: int = None):
+    """
+    Boucle de capture UDP F1 25 -> append_point(...) + statut console.
+    Le thread de capture ne fait d'autre E/S bloquante que recvfrom : logs
+    via file bornée (telemetry_store), statut rendu par ConsoleStatus.
+    fanout_port (ou FANOUT_PORT / FANOUT_UNIX) : diffusion locale des points.
+    Les paquets sont routés par PacketRouter : les types non abonnés ne sont
+    pas décodés.
+    """
+    get_logger()   # point d'entrée : handlers fichier + QueueListener
+    add_listener(lap_analytics)
+    add_listener(track_map)
+    add_listener(delta_tracker)
+    add_listener(session_recorder)
+
+    if fanout_port is None:
+        fanout_port = int(os.getenv("FANOUT_PORT", "0"))
+    if fanout_port or os.getenv("FANOUT_UNIX"):
+        from fanout import start_fanout
+        try:
+            start_fanout(port=fanout_port)
+        except OSError as e:
+            _logger.error("fanout: start failed: %s", e)
+
     # Socket
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -22,93 +53,113 @@ def run_capture():
             _logger.info("SO_RCVBUF set to 1MiB")
         except Exception as e:
             _logger.warning("SO_RCVBUF set failed: %s", e)
-        sock.bind((UDP_IP, UDP_PORT))
-        sock.setblocking(False)
-        print(f"[capture] Écoute UDP sur {UDP_IP}:{UDP_PORT} (OK)")
-        print("[capture] Assure-toi que F1 25 envoie vers 127.0.0.1:20777")
-        _logger.info("UDP bind OK on %s:%d", UDP_IP, UDP_PORT)
+        sock.bind((ip, port))
+        sock.settimeout(RECV_TIMEOUT_S)
+        print(f"[capture] Écoute UDP sur {ip}:{port} (OK)")
+        print(f"[capture] Assure-toi que F1 25 envoie vers 127.0.0.1:{port}")
+        _logger.info("UDP bind OK on %s:%d", ip, port)
     except OSError as e:
-        msg = f"[capture][ERREUR] Impossible de bind sur {UDP_IP}:{UDP_PORT} -> {e}"
+        msg = f"[capture][ERREUR] Impossible de bind sur {ip}:{port} -> {e}"
         print(msg)
         _logger.error(msg)
         return
 
     last_lap_pkt = None
-    last_print = 0
-    PRINT_HZ = 20  # console seulement
+    status = ConsoleStatus(PRINT_HZ).start()
     pkt_count = 0
     t0 = time.time()
     last_pps_log = t0
 
+    def on_lap_data(packet):
+        nonlocal last_lap_pkt
+        last_lap_pkt = packet
+
+    def on_motion(packet):
+        player_idx = packet.header.playerCarIndex
+        lap = last_lap_pkt.lapData[player_idx] if last_lap_pkt else None
+        track_map.update_cars(packet.carMotionData, player_idx, lap,
+                              packet.header.sessionUID)
+
+    def on_car_telemetry(packet):
+        nonlocal pkt_count, last_pps_log
+        pkt_count += 1
+        now = time.time()
+
+        # Log PPS (packets per second) + compteurs du routeur toutes les 5 s
+        if now - last_pps_log >= 5.0:
+            pps = pkt_count / max(1e-6, (now - t0))
+            _logger.info("PPS=%.1f (packets count=%d) skipped=%d received=%s",
+                         pps, pkt_count, router.skipped, router.stats()["received"])
+            last_pps_log = now
+
+        player_idx = packet.header.playerCarIndex
+        car = packet.carTelemetryData[player_idx]
+        lap = last_lap_pkt.lapData[player_idx] if last_lap_pkt else None
+
+        pos_str = str(getattr(lap, "carPosition", "?")) if lap else "?"
+        lap_num = int(getattr(lap, "currentLapNum", 0) or 0)
+        last_ms = int(getattr(lap, "lastLapTimeInMS", 0) or 0)
+        invalid = int(getattr(lap, "currentLapInvalid", 0) or 0)
+        lapDist = float(getattr(lap, "lapDistance", 0.0) or 0.0)
+        curLapMs = float(
+            getattr(lap, "currentLapTimeInMS", 0.0) or 0.0)
+        sector = int(getattr(lap, "sector", 0) or 0)
+        s1_ms = (int(getattr(lap, "sector1TimeMinutesPart", 0) or 0) * 60000
+                 + int(getattr(lap, "sector1TimeMSPart", 0) or 0))
+        s2_ms = (int(getattr(lap, "sector2TimeMinutesPart", 0) or 0) * 60000
+                 + int(getattr(lap, "sector2TimeMSPart", 0) or 0))
+
+        p = {
+            "t": time.time(),
+            "t_game_ms": curLapMs,
+            "speed": car.speed,
+            "rpm": car.engineRPM,
+            "gear": car.gear,
+            "throttle": car.throttle,
+            "brake": car.brake,
+            "lap": lap_num,
+            "invalid": invalid,
+            "lapDist": lapDist,
+            "sector": sector,
+            "s1_ms": s1_ms,
+            "s2_ms": s2_ms,
+            "last_lap_ms": last_ms,
+            "session_uid": packet.header.sessionUID,
+            "session_time": packet.header.sessionTime,
+            "frame": packet.header.frameIdentifier,
+        }
+        delta = delta_tracker.annotate(p)
+        append_point(p)
+
+        # Console : dernier état, rendu par le thread ConsoleStatus
+        status.latest = (car.speed, pos_str, lap_num, last_ms,
+                         invalid, curLapMs, delta)
+
+    router = PacketRouter()
+    router.subscribe(PacketId.LAP_DATA, on_lap_data)
+    router.subscribe(PacketId.MOTION, on_motion)
+    router.subscribe(PacketId.SESSION, session_recorder.on_session)
+    router.subscribe(PacketId.PARTICIPANTS, session_recorder.on_participants)
+    router.subscribe(PacketId.CAR_TELEMETRY, on_car_telemetry)
+
     try:
         while True:
             try:
                 data, addr = sock.recvfrom(4096)
-            except BlockingIOError:
-                time.sleep(0.001)
+            except socket.timeout:
                 continue
             except Exception as e:
                 _logger.error("recvfrom ERROR: %s", e)
                 continue
 
-            packet = parse_packet(data)
-            if not packet:
-                continue
-
-            if isinstance(packet, PacketLapData):
-                last_lap_pkt = packet
-                continue
-
-            if isinstance(packet, PacketCarTelemetryData):
-                pkt_count += 1
-                now = time.time()
-
-                # Log PPS (packets per second) toutes les 5 s
-                if now - last_pps_log >= 5.0:
-                    pps = pkt_count / max(1e-6, (now - t0))
-                    _logger.info("PPS=%.1f (packets count=%d)", pps, pkt_count)
-                    last_pps_log = now
-
-                player_idx = packet.header.playerCarIndex
-                car = packet.carTelemetryData[player_idx]
-                lap = last_lap_pkt.lapData[player_idx] if last_lap_pkt else None
-
-                pos_str = str(getattr(lap, "carPosition", "?")) if lap else "?"
-                lap_num = int(getattr(lap, "currentLapNum", 0) or 0)
-                last_ms = int(getattr(lap, "lastLapTimeInMS", 0) or 0)
-                invalid = int(getattr(lap, "currentLapInvalid", 0) or 0)
-                lapDist = float(getattr(lap, "lapDistance", 0.0) or 0.0)
-                curLapMs = float(
-                    getattr(lap, "currentLapTimeInMS", 0.0) or 0.0)
-
-                # Console (rate-limité)
-                if now - last_print >= 1.0 / PRINT_HZ:
-                    sys.stdout.write(
-                        f"\rVitesse: {car.speed:4d} km/h "
-                        f"Pos: {pos_str} Lap: {lap_num} "
-                        f"LastLap: {last_ms} ms Invalid: {invalid} "
-                        f"Laps time: {curLapMs:.0f} ms "
-                    )
-                    sys.stdout.flush()
-                    last_print = now
-
-                append_point({
-                    "t": time.time(),
-                    "t_game_ms": curLapMs,
-                    "speed": car.speed,
-                    "rpm": car.engineRPM,
-                    "gear": car.gear,
-                    "throttle": car.throttle,
-                    "brake": car.brake,
-                    "lap": lap_num,
-                    "invalid": invalid,
-                    "lapDist": lapDist,
-                })
+            router.route(data)
 
     except KeyboardInterrupt:
         print("\n[capture] Arrêt demandé (Ctrl+C)")
         _logger.info("Capture stopped by user")
     finally:
+        status.stop()
+        _logger.info("packet router: %s", router.stats())
         try:
             sock.close()
             print("\n[capture] Socket fermée.")
@@ -0,0 +1,169 @@
+# telemetry_export.py
+import csv
+import importlib.util
+import io
+import logging
+import os
+import struct
+import time
+
+from telemetry_store import LOG_DIR, points_since, telemetry_buf, telemetry_lock, telemetry_stat
+
+# --------- Config ---------
+CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+EXPORT_DIR = os.path.join(LOG_DIR, "exports")
+EXPORT_COLUMNS = ["t", "t_game_ms", "speed", "rpm", "gear",
+                  "throttle", "brake", "lap", "invalid", "lapDist"]
+# Parquet/Arrow : seulement si pyarrow est installé (dépendance optionnelle)
+PYARROW_FORMATS = ("parquet", "arrow")
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+FORMATS = ("csv",) + (PYARROW_FORMATS if HAS_PYARROW else ()) + ("raw",)
+
+# Format binaire brut : en-tête + enregistrements fixes little-endian
+RAW_MAGIC = b"F1TL"
+RAW_VERSION = 1
+RAW_RECORD = struct.Struct("<dfHHbffBBf")   # même ordre que EXPORT_COLUMNS
+
+_logger = logging.getLogger("telemetry")   # handlers : telemetry_store.get_logger()
+
+
+def iter_chunks(chunk_size: int = CHUNK_SIZE, laps=None, t_range=None):
+    """
+    Parcourt la timeline par tranches de chunk_size points (listes de dicts),
+    paginée sur l'index absolu (points_since) : les évictions
+    (TELEMETRY_MAXLEN) ne décalent pas la lecture. Le verrou n'est tenu que
+    le temps de copier une tranche ; l'export couvre les points présents au
+    démarrage, coupés au point de reprise si un flashback survient.
+    laps : ensemble de numéros de tour ; t_range : (t_min, t_max) en
+    secondes epoch sur 't'.
+    """
+    laps = set(laps) if laps else None
+    t_min, t_max = t_range if t_range else (None, None)
+    with telemetry_lock:
+        end = telemetry_stat["timeline_len"]
+        pos = end - len(telemetry_buf)
+        rewinds = telemetry_stat["rewinds"]
+    while pos < end:
+        start, chunk, stat = points_since(pos, min(chunk_size, end - pos), rewinds)
+        if stat["rewinds"] != rewinds:
+            # flashback pendant l'export : fin ramenée au plus bas point de coupe
+            end = min(end, points_since(end, 0, rewinds)[0])
+            rewinds = stat["rewinds"]
+            if start < pos:
+                break   # points déjà exportés abandonnés
+        chunk = chunk[:max(0, end - start)]
+        if start > pos:
+            _logger.warning("export: %d points évincés (TELEMETRY_MAXLEN) pendant l'export",
+                            start - pos)
+        if not chunk:
+            break
+        pos = start + len(chunk)
+        if laps is not None or t_range:
+            chunk = [p for p in chunk
+                     if (laps is None or p.get("lap") in laps)
+                     and (t_min is None or p.get("t", 0.0) >= t_min)
+                     and (t_max is None or p.get("t", 0.0) <= t_max)]
+        if chunk:
+            yield chunk
+
+
+def iter_csv(chunks):
+    """Octets CSV, une tranche à la fois (en-tête compris)."""
+    yield (",".join(EXPORT_COLUMNS) + "\n").encode("utf-8")
+    out = io.StringIO()
+    w = csv.writer(out, lineterminator="\n")
+    for chunk in chunks:
+        w.writerows([p.get(c) for c in EXPORT_COLUMNS] for p in chunk)
+        yield out.getvalue().encode("utf-8")
+        out.seek(0)
+        out.truncate()
+
+
+def iter_raw(chunks):
+    """Octets au format brut : RAW_MAGIC, version, nb colonnes, noms, enregistrements."""
+    names = ",".join(EXPORT_COLUMNS).encode("ascii")
+    yield RAW_MAGIC + struct.pack("<HHH", RAW_VERSION, len(EXPORT_COLUMNS), len(names)) + names
+    pack = RAW_RECORD.pack
+    for chunk in chunks:
+        yield b"".join(pack(
+            float(p.get("t", 0.0) or 0.0), float(p.get("t_game_ms", 0.0) or 0.0),
+            int(p.get("speed", 0) or 0), int(p.get("rpm", 0) or 0),
+            int(p.get("gear", 0) or 0), float(p.get("throttle", 0.0) or 0.0),
+            float(p.get("brake", 0.0) or 0.0), int(p.get("lap", 0) or 0),
+            int(p.get("invalid", 0) or 0), float(p.get("lapDist", 0.0) or 0.0))
+            for p in chunk)
+
+
+def read_raw(path: str):
+    """Relit un export brut : générateur de dicts."""
+    with open(path, "rb") as fp:
+        if fp.read(4) != RAW_MAGIC:
+            raise ValueError(f"{path}: pas un export brut F1TL")
+        _version, _ncols, nlen = struct.unpack("<HHH", fp.read(6))
+        cols = fp.read(nlen).decode("ascii").split(",")
+        while True:
+            block = fp.read(RAW_RECORD.size * 4096)
+            if not block:
+                break
+            for rec in RAW_RECORD.iter_unpack(block):
+                yield dict(zip(cols, rec))
+
+
+def _arrow_table(pa, chunk):
+    return pa.table({c: [p.get(c) for p in chunk] for c in EXPORT_COLUMNS})
+
+
+def _write_pyarrow(fmt: str, path: str, chunks):
+    import pyarrow as pa   # dépendance optionnelle, chargée à l'export
+    writer = None
+    try:
+        for chunk in chunks:
+            table = _arrow_table(pa, chunk)
+            if writer is None:
+                if fmt == "parquet":
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    import pyarrow.ipc as ipc
+                    writer = ipc.new_file(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def check_format(fmt: str):
+    """ValueError si fmt n'est pas exportable ici (inconnu, ou pyarrow absent)."""
+    if fmt in FORMATS:
+        return
+    if fmt in PYARROW_FORMATS:
+        raise ValueError(f"format {fmt} indisponible: pyarrow n'est pas installé")
+    raise ValueError(f"format inconnu: {fmt} (attendu: {', '.join(FORMATS)})")
+
+
+def export_to_file(fmt: str = "csv", path: str = None, laps=None, t_range=None,
+                   chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Écrit un export par tranches (mémoire bornée par chunk_size).
+    Retourne le chemin écrit, "" en cas d'erreur (voir logs).
+    """
+    check_format(fmt)
+    if path is None:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        ext = {"arrow": "arrow", "raw": "f1tl"}.get(fmt, fmt)
+        path = os.path.join(EXPORT_DIR, time.strftime(f"telemetry_%Y%m%d_%H%M%S.{ext}"))
+    t0 = time.perf_counter()
+    chunks = iter_chunks(chunk_size, laps, t_range)
+    try:
+        if fmt in PYARROW_FORMATS:
+            _write_pyarrow(fmt, path, chunks)
+        else:
+            gen = iter_csv(chunks) if fmt == "csv" else iter_raw(chunks)
+            with open(path, "wb") as fp:
+                for data in gen:
+                    fp.write(data)
+    except Exception as e:
+        _logger.error("export_to_file(%s) ERROR: %s", fmt, e)
+        return ""
+    _logger.info("export_to_file: %s (%.1f ms)", path, (time.perf_counter() - t0) * 1000.0)
+    return path
@@ -1,12 +1,14 @@
 
 # telemetry_store.py
 import collections
+import itertools
 import threading
 import os
 import time
 import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import atexit
 
 # --- Configuration ---
 VAL = os.getenv("TELEMETRY_MAXLEN", "0")  # "0" => illimité
@@ -16,15 +18,66 @@ try:
 except ValueError:
     MAXLEN = None
 
+# Branches abandonnées (flashback) conservées pour analyse : "0" => aucune
+try:
+    KEEP_BRANCHES = max(0, int(os.getenv("TELEMETRY_KEEP_BRANCHES", "0")))
+except ValueError:
+    KEEP_BRANCHES = 0
+
 # "DEBUG" pour plus verbeux
 LOG_LEVEL = os.getenv("DEBUG_LEVEL", "INFO").upper()
 LOG_DIR = os.getenv("LOG_DIR", "logs")
 LOG_FILE = os.path.join(LOG_DIR, "app_debug.log")
 
-# --- Préparer logger global ---
-os.makedirs(LOG_DIR, exist_ok=True)
+# File d'attente des logs : au-delà, les entrées sont abandonnées et comptées
+try:
+    LOG_QUEUE_MAX = max(1, int(os.getenv("LOG_QUEUE_MAX", "10000")))
+except ValueError:
+    LOG_QUEUE_MAX = 10000
+
+# --- Logger global (handlers installés au premier get_logger()) ---
+# Les modules utilisent logging.getLogger("telemetry") ; seuls les points
+# d'entrée (run_capture, capture_headless, dash_fi, CLI) appellent
+# get_logger(), importer un module ne crée ni LOG_DIR ni thread.
+# Les threads émetteurs (capture, callbacks) ne font qu'un put_nowait dans une
+# file bornée ; l'écriture fichier (et la rotation) se fait dans le thread
+# du QueueListener.
 _logger = logging.getLogger("telemetry")
-if not _logger.handlers:
+_logger_ready = False
+_log_listener = None
+
+
+class _DroppingQueueHandler(logging.Handler):
+    """QueueHandler non bloquant : file pleine => entrée perdue et comptée."""
+
+    def __init__(self, q):
+        super().__init__()
+        self.queue = q
+
+    def emit(self, record):
+        try:
+            # message figé dans le thread émetteur (args éventuellement mutables),
+            # traceback formatée par le listener
+            record.msg = record.getMessage()
+            record.args = None
+            self.queue.put_nowait(record)
+        except queue.Full:
+            telemetry_stat["log_dropped"] += 1
+        except Exception:
+            self.handleError(record)
+
+
+def _setup_logging():
+    """
+    Crée LOG_DIR, le RotatingFileHandler et son QueueListener ;
+    pas d'effet de bord à l'import.
+    """
+    global _logger_ready, _log_listener
+    _logger_ready = True
+    if _logger.handlers:
+        return
+    from logging.handlers import QueueListener, RotatingFileHandler
+    os.makedirs(LOG_DIR, exist_ok=True)
     _logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
     handler = RotatingFileHandler(
         LOG_FILE, maxBytes=2_000_000, backupCount=5, encoding="utf-8")
@@ -33,9 +86,14 @@ if not _logger.handlers:
         datefmt="%Y-%m-%d %H:%M:%S",
     )
     handler.setFormatter(fmt)
-    _logger.addHandler(handler)
+    q = queue.Queue(maxsize=LOG_QUEUE_MAX)
+    _log_listener = QueueListener(q, handler, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)   # vide la file à la sortie
+    _logger.addHandler(_DroppingQueueHandler(q))
     _logger.propagate = False
 
+
 # --- Buffer + Lock + Statistiques ---
 telemetry_buf = collections.deque(maxlen=MAXLEN)
 telemetry_lock = threading.RLock()
@@ -44,24 +102,151 @@ telemetry_stat = {
     "last_append_ts": 0.0,     # horodatage 't' du dernier point (horloge jeu)
     "last_append_wall": 0.0,   # time.time() du dernier append (horloge mur)
     "maxlen": MAXLEN,
+    "rewinds": 0,              # nb de flashbacks détectés (génération de timeline)
+    "timeline_len": 0,         # index absolu du prochain point de la timeline
+    "last_session_uid": None,
+    "last_session_time": None,  # sessionTime (s) du dernier point
+    "last_frame": None,         # frameIdentifier du dernier point
+    "log_dropped": 0,           # entrées de log perdues (file pleine)
 }
+# Branches abandonnées : chaque entrée = liste des points coupés lors d'un flashback
+telemetry_branches = collections.deque(maxlen=KEEP_BRANCHES or None)
+# Historique des coupes : (n° de rewind, timeline_len après coupe)
+_rewind_log = collections.deque(maxlen=256)
+# Consommateurs incrémentaux (analytics...) appelés sous telemetry_lock
+_listeners = []
 
 
 def get_logger():
-    """Retourne le logger partagé."""
+    """Retourne le logger partagé, configuré au premier appel (points d'entrée)."""
+    if not _logger_ready:
+        with telemetry_lock:
+            if not _logger_ready:
+                _setup_logging()
     return _logger
 
 
+def add_listener(listener):
+    """
+    Enregistre un consommateur incrémental. Il doit exposer on_append(p),
+    appelé après chaque append, et peut exposer on_rewind(buf, lap_tail),
+    appelé après une coupe de flashback avec le buffer tronqué et les points
+    survivants de son dernier tour (liste dans l'ordre, calculée une seule
+    fois pour tous). Les deux sont appelés sous telemetry_lock : ils doivent
+    rester O(1) par point.
+    """
+    with telemetry_lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with telemetry_lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def _notify(method: str, *args):
+    for listener in _listeners:
+        fn = getattr(listener, method, None)
+        if fn is None:
+            continue
+        try:
+            fn(*args)
+        except Exception as e:
+            _logger.error("listener %s.%s ERROR: %s",
+                          type(listener).__name__, method, e, exc_info=True)
+
+
+def _is_rewind(p: dict) -> bool:
+    """
+    Vrai si le point remonte le temps de jeu (flashback) dans la même session :
+    'session_time' ou 'frame' inférieur au dernier point reçu.
+    """
+    uid = p.get("session_uid")
+    if uid is not None and uid != telemetry_stat["last_session_uid"]:
+        return False
+    last_st = telemetry_stat["last_session_time"]
+    st = p.get("session_time")
+    if st is not None and last_st is not None and st < last_st:
+        return True
+    last_fr = telemetry_stat["last_frame"]
+    fr = p.get("frame")
+    return fr is not None and last_fr is not None and fr < last_fr
+
+
+def _lap_tail() -> list:
+    """Points du dernier tour (même session) en fin de buffer, dans l'ordre."""
+    tail = []
+    if telemetry_buf:
+        last = telemetry_buf[-1]
+        lap, uid = last.get("lap"), last.get("session_uid")
+        for q in reversed(telemetry_buf):
+            if q.get("lap") != lap or q.get("session_uid") != uid:
+                break
+            tail.append(q)
+        tail.reverse()
+    return tail
+
+
+def _truncate_to(p: dict):
+    """
+    Coupe logique de la fin de timeline au point de reprise du flashback.
+    On dépile par la droite tous les points postérieurs (pop O(1), chaque point
+    n'est dépilé qu'une fois => O(1) amorti par échantillon ingéré). La coupe
+    s'arrête à la session précédente : ses sessionTime ne sont pas comparables.
+    """
+    uid = p.get("session_uid")
+    st = p.get("session_time")
+    fr = p.get("frame")
+    cut = []
+    while telemetry_buf:
+        last = telemetry_buf[-1]
+        if uid is not None and last.get("session_uid") != uid:
+            break
+        if st is not None and last.get("session_time") is not None:
+            if last["session_time"] < st:
+                break
+        elif fr is not None and last.get("frame") is not None:
+            if last["frame"] < fr:
+                break
+        else:
+            break
+        cut.append(telemetry_buf.pop())
+    if KEEP_BRANCHES and cut:
+        cut.reverse()
+        telemetry_branches.append(cut)
+    telemetry_stat["rewinds"] += 1
+    telemetry_stat["timeline_len"] -= len(cut)
+    _rewind_log.append((telemetry_stat["rewinds"], telemetry_stat["timeline_len"]))
+    _logger.info("rewind: session_time=%s frame=%s cut=%d len=%d",
+                 st, fr, len(cut), len(telemetry_buf))
+    _notify("on_rewind", telemetry_buf, _lap_tail())
+
+
 def append_point(p: dict):
     """
     Append thread-safe + mise à jour des stats + log léger (rate-limit).
     Exige au minimum 't' (time.time), 't_game_ms', 'lap'.
+    Si le point porte 'session_time'/'frame' et remonte le temps (flashback),
+    la timeline active est d'abord tronquée au point de reprise.
     """
     now = time.time()
     if "t" not in p:
         p["t"] = now
     with telemetry_lock:
+        if _is_rewind(p):
+            _truncate_to(p)
         telemetry_buf.append(p)
+        telemetry_stat["timeline_len"] += 1
+        if "session_uid" in p:
+            telemetry_stat["last_session_uid"] = p["session_uid"]
+        if "session_time" in p:
+            telemetry_stat["last_session_time"] = p["session_time"]
+        if "frame" in p:
+            telemetry_stat["last_frame"] = p["frame"]
+        if _listeners:
+            _notify("on_append", p)
         telemetry_stat["seq"] += 1
         telemetry_stat["last_append_ts"] = float(p.get("t", now))
         telemetry_stat["last_append_wall"] = now
@@ -86,18 +271,65 @@ def snapshot():
         return buf_copy, stat_copy
 
 
+def points_since(start: int, limit: int = 20000, rewinds_seen: int = None):
+    """
+    Points de la timeline à partir de l'index absolu `start` (au plus `limit`).
+    Index absolu = position depuis le début de la timeline ; stable tant
+    qu'aucun flashback ne la coupe. Si rewinds_seen (stat['rewinds'] connu du
+    lecteur) est dépassé, start est ramené au plus petit point de coupe depuis :
+    le lecteur tronque sa copie à start_effectif puis ajoute les points.
+    Retourne (start_effectif, points, stat) ; start_effectif > start si les
+    points demandés ont été évincés (TELEMETRY_MAXLEN).
+    Le deque est parcouru depuis l'extrémité la plus proche : O(points
+    renvoyés) pour la queue (lecteurs live), O(min(distance aux bords))
+    pour une page au milieu (export, rattrapage).
+    """
+    with telemetry_lock:
+        end = telemetry_stat["timeline_len"]
+        first = end - len(telemetry_buf)
+        if rewinds_seen is not None and rewinds_seen != telemetry_stat["rewinds"]:
+            log = _rewind_log
+            if log and log[0][0] <= rewinds_seen + 1:
+                start = min([start] + [n for r, n in log if r > rewinds_seen])
+            else:
+                start = 0   # historique insuffisant : relecture complète
+        start = min(max(start, first), end)
+        n = min(end - start, max(0, limit))
+        off = start - first
+        skip = end - start - n          # points après la page
+        if skip <= off:
+            pts = list(itertools.islice(reversed(telemetry_buf), skip, skip + n))
+            pts.reverse()
+        else:
+            pts = list(itertools.islice(telemetry_buf, off, off + n))
+        return start, pts, dict(telemetry_stat)
+
+
+def branches_snapshot():
+    """
+    Copie des branches abandonnées par les flashbacks (les plus anciennes d'abord).
+    Vide si TELEMETRY_KEEP_BRANCHES=0.
+    """
+    with telemetry_lock:
+        return [list(b) for b in telemetry_branches]
+
+
 def dump_snapshot(max_points: int = 20000, filename_prefix: str = "snapshot"):
     """
-    Écrit un snapshot JSON du buffer (limité à max_points) dans LOG_DIR.
+    Écrit un snapshot JSON du buffer (limité à max_points) dans LOG_DIR,
+    avec les branches abandonnées gardées (TELEMETRY_KEEP_BRANCHES).
     Retourne le chemin du fichier écrit.
     """
     ts = time.strftime("%Y%m%d_%H%M%S")
+    os.makedirs(LOG_DIR, exist_ok=True)
     path = os.path.join(LOG_DIR, f"{filename_prefix}_{ts}.json")
     with telemetry_lock:
         data = list(telemetry_buf)[-max_points:]
+        meta = dict(telemetry_stat)
+        branches = branches_snapshot()
     try:
         with open(path, "w", encoding="utf-8") as fp:
-            json.dump({"points": data, "meta": telemetry_stat},
+            json.dump({"points": data, "meta": meta, "branches": branches},
                       fp, ensure_ascii=False, indent=2)
         _logger.info("dump_snapshot: %s (points=%d)", path, len(data))
         return path
@@ -0,0 +1,84 @@
+# tests/test_telemetry_store.py
+import collections
+
+import pytest
+
+import telemetry_store as ts
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    """Store vide à chaque test (l'état du module est global)."""
+    monkeypatch.setattr(ts, "telemetry_buf", collections.deque())
+    monkeypatch.setattr(ts, "_rewind_log", collections.deque(maxlen=256))
+    monkeypatch.setattr(ts, "_listeners", [])
+    stat = dict(ts.telemetry_stat, seq=0, rewinds=0, timeline_len=0, last_session_uid=None,
+                last_session_time=None, last_frame=None)
+    monkeypatch.setattr(ts, "telemetry_stat", stat)
+
+
+def _add(uid, st, lap=1):
+    ts.append_point({"t": 0.0, "t_game_ms": 0.0, "lap": lap, "session_uid": uid,
+                     "session_time": float(st), "frame": int(st * 10)})
+
+
+def test_rewind_stops_at_previous_session():
+    for st in range(100, 200):
+        _add(1, st)
+    for st in range(10, 20):
+        _add(2, st)
+    _add(2, 5)   # flashback dans la session 2
+    buf = list(ts.telemetry_buf)
+    assert [p["session_uid"] for p in buf].count(1) == 100
+    assert [(p["session_uid"], p["session_time"]) for p in buf[100:]] == [(2, 5.0)]
+    assert ts.telemetry_stat["rewinds"] == 1
+    assert ts.telemetry_stat["timeline_len"] == 101
+
+
+def test_timeline_len_and_points_since_after_rewind():
+    for st in range(50):
+        _add(1, st)
+    start, pts, stat = ts.points_since(0)
+    assert (start, len(pts), stat["timeline_len"]) == (0, 50, 50)
+
+    _add(1, 20)   # coupe les points 20..49
+    assert ts.telemetry_stat["timeline_len"] == 21
+    assert ts.telemetry_stat["rewinds"] == 1
+
+    # lecteur à jour jusqu'à 50 avec rewinds=0 : ramené au point de coupe
+    start, pts, stat = ts.points_since(50, rewinds_seen=0)
+    assert start == 20
+    assert [p["session_time"] for p in pts] == [20.0]
+    # lecteur déjà au courant du flashback : rien de neuf
+    start, pts, _ = ts.points_since(21, rewinds_seen=1)
+    assert (start, pts) == (21, [])
+
+
+def test_points_since_after_eviction(monkeypatch):
+    monkeypatch.setattr(ts, "telemetry_buf", collections.deque(maxlen=10))
+    for st in range(30):
+        _add(1, st)
+    start, pts, stat = ts.points_since(5, limit=4)
+    assert start == 20   # points 5..19 évincés
+    assert [p["session_time"] for p in pts] == [20.0, 21.0, 22.0, 23.0]
+    start, pts, _ = ts.points_since(26)
+    assert (start, [p["session_time"] for p in pts]) == (26, [26.0, 27.0, 28.0, 29.0])
+
+
+def test_on_rewind_receives_lap_tail():
+    calls = []
+
+    class Listener:
+        def on_append(self, p):
+            pass
+
+        def on_rewind(self, buf, lap_tail):
+            calls.append((len(buf), [(p["lap"], p["session_time"]) for p in lap_tail]))
+
+    for st in range(10):
+        _add(1, st, lap=1)
+    for st in range(10, 20):
+        _add(1, st, lap=2)
+    ts.add_listener(Listener())
+    _add(1, 13, lap=2)
+    assert calls == [(13, [(2, 10.0), (2, 11.0), (2, 12.0)])]
@@ -0,0 +1,85 @@
+# trace_cache.py
+"""
+Cache LRU des tableaux de traces prêts à tracer (x/y décimés) pour les
+tours terminés : leur contenu ne change plus, inutile de les reconstruire
+à chaque tick du dashboard.
+
+Clé : (session, lap, segment, fin, canal, décimation) — segment/fin viennent
+de store_client.TimelineMirror et changent si un flashback recoupe le tour.
+Taille bornée en nombre total de valeurs ; purge explicite sur flashback
+(retain) ou changement de session (clear).
+"""
+import collections
+import os
+import threading
+
+# --------- Config ---------
+TRACE_CACHE_MAX_VALUES = int(os.getenv("TRACE_CACHE_MAX_VALUES", "2000000"))
+
+
+class TraceCache:
+    def __init__(self, max_values: int = TRACE_CACHE_MAX_VALUES):
+        self.max_values = max_values
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()   # clé -> liste de valeurs
+        self._size = 0
+        self.session = None
+        self.rewinds = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, build):
+        """Valeur en cache pour `key`, sinon build() (mise en cache, éviction LRU)."""
+        with self._lock:
+            val = self._entries.get(key)
+            if val is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return val
+            self.misses += 1
+        val = build()
+        with self._lock:
+            if key not in self._entries and len(val) <= self.max_values:
+                self._entries[key] = val
+                self._size += len(val)
+                while self._size > self.max_values:
+                    _, old = self._entries.popitem(last=False)
+                    self._size -= len(old)
+                    self.evictions += 1
+        return val
+
+    def sync(self, session, rewinds, live_segments):
+        """
+        À appeler avant les lectures : vide le cache si la session change,
+        purge les tours recoupés si un flashback a eu lieu depuis le dernier
+        appel (live_segments() -> {(lap, segment)} encore valides).
+        """
+        if session != self.session:
+            self.clear()
+            self.session = session
+            self.rewinds = rewinds
+        elif rewinds != self.rewinds:
+            self.rewinds = rewinds
+            self.retain(live_segments())
+
+    def retain(self, live):
+        """Après un flashback : ne garde que les entrées dont (lap, segment) est dans `live`."""
+        with self._lock:
+            for key in [k for k in self._entries if (k[1], k[2]) not in live]:
+                self._size -= len(self._entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "values": self._size,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0}
+
+
+# Instance partagée (par worker Dash)
+trace_cache = TraceCache()
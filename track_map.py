@@ -0,0 +1,230 @@
+# track_map.py
+import collections
+import math
+import os
+import threading
+
+
+# --------- Config ---------
+BIN_M = float(os.getenv("TRACKMAP_BIN_M", "10"))          # taille d'un bin (m de lapDist)
+MIN_COVERAGE = 0.95      # part des bins vus pour accepter un tour "propre"
+SIMPLIFY_EPS_M = 1.0     # tolérance Douglas-Peucker du tracé affiché
+HEAT_UNDO_LAPS = 3       # tours dont l'apport à la heat-map peut être retiré (flashback)
+
+HEAT_CHANNELS = ("speed", "brake", "throttle")
+
+
+def _simplify(pts, eps):
+    """Douglas-Peucker itératif sur une liste de (x, z)."""
+    if len(pts) < 3:
+        return list(pts)
+    keep = [False] * len(pts)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        a, b = stack.pop()
+        ax, az = pts[a]
+        bx, bz = pts[b]
+        dx, dz = bx - ax, bz - az
+        norm = math.hypot(dx, dz)
+        far, far_d = None, eps
+        for i in range(a + 1, b):
+            px, pz = pts[i]
+            if norm > 1e-9:
+                d = abs(dz * (px - ax) - dx * (pz - az)) / norm
+            else:   # boucle fermée : extrémités confondues
+                d = math.hypot(px - ax, pz - az)
+            if d > far_d:
+                far, far_d = i, d
+        if far is not None:
+            keep[far] = True
+            stack.append((a, far))
+            stack.append((far, b))
+    return [p for p, k in zip(pts, keep) if k]
+
+
+class TrackMap:
+    """
+    Carte de piste construite à partir des paquets Motion.
+      - tracé : premier tour propre du joueur, échantillonné par bins de
+        lapDistance (index spatial = int(lapDist / BIN_M)) puis simplifié ;
+      - positions live des 22 voitures (dernier paquet Motion) ;
+      - heat-map vitesse / frein / gaz : moyennes par bin mises à jour en O(1)
+        par point (listener telemetry_store), jamais recalculées. L'apport des
+        HEAT_UNDO_LAPS derniers tours est gardé par tour pour être retiré sur
+        flashback ; une coupe qui remonte plus loin laisse l'apport des tours
+        plus anciens de la branche abandonnée.
+    Tout est remis à zéro quand session_uid change (autre piste).
+    """
+
+    def __init__(self, bin_m: float = BIN_M):
+        self.bin_m = bin_m
+        self._lock = threading.Lock()
+        self._session = None
+        # versions (le dashboard ne renvoie que ce qui a changé) : croissantes,
+        # y compris à travers les remises à zéro
+        self.outline_version = 0
+        self.heat_version = 0
+        self.cars_version = 0
+        self._clear()
+
+    def _clear(self):
+        # construction du tracé
+        self._trace_lap = None
+        self._trace_bins = {}
+        self._trace_invalid = False
+        self.outline_bins = []     # bin -> (x, z) ; vide tant que non construit
+        self.outline = []          # polyline simplifiée [(x, z), ...]
+        # heat-map : bin -> [n, somme speed, somme brake, somme throttle]
+        self._heat = []
+        # apport des derniers tours : (lap, {bin: [n, speed, brake, throttle]})
+        self._heat_runs = collections.deque(maxlen=HEAT_UNDO_LAPS)
+        # voitures
+        self.cars = []             # voitures actives [(x, z), ...]
+        self.player_idx = None     # index du joueur dans self.cars
+        self.outline_version += 1
+        self.heat_version += 1
+        self.cars_version += 1
+
+    def _check_session(self, session):
+        if session is not None and session != self._session:
+            if self._session is not None:
+                self._clear()
+            self._session = session
+
+    # ---- Motion -------------------------------------------------------
+    def update_cars(self, car_motion, player_idx: int, lap=None, session=None):
+        """
+        car_motion : PacketMotionData.carMotionData ; lap : LapData du joueur
+        (dernier PacketLapData) pour relier position et lapDistance ;
+        session : sessionUID de l'en-tête Motion.
+        Les emplacements inutilisés (position 0,0,0) ne sont pas gardés.
+        """
+        cars = []
+        idx = None
+        for i, m in enumerate(car_motion):
+            if i == player_idx:
+                idx = len(cars)
+            elif not (m.worldPositionX or m.worldPositionY or m.worldPositionZ):
+                continue
+            cars.append((m.worldPositionX, m.worldPositionZ))
+        with self._lock:
+            self._check_session(session)
+            self.cars = cars
+            self.player_idx = idx
+            self.cars_version += 1
+            if self.outline_bins or lap is None or idx is None:
+                return
+            self._feed_outline(lap, cars[idx])
+
+    def _feed_outline(self, lap, pos):
+        lap_num = int(getattr(lap, "currentLapNum", 0) or 0)
+        dist = float(getattr(lap, "lapDistance", 0.0) or 0.0)
+        if lap_num != self._trace_lap:
+            if self._trace_lap is not None and not self._trace_invalid:
+                self._try_build_outline()
+                if self.outline_bins:
+                    return
+            self._trace_lap = lap_num
+            self._trace_bins = {}
+            self._trace_invalid = False
+        if getattr(lap, "currentLapInvalid", 0):
+            self._trace_invalid = True
+        if dist >= 0.0:
+            self._trace_bins[int(dist / self.bin_m)] = pos
+
+    def _try_build_outline(self):
+        bins = self._trace_bins
+        if not bins:
+            return
+        n = max(bins) + 1
+        if len(bins) < MIN_COVERAGE * n:
+            return   # tour partiel (début de capture en cours de tour...)
+        outline, last = [], None
+        for b in range(n):
+            last = bins.get(b, last)
+            outline.append(last if last is not None else bins[min(bins)])
+        self.outline_bins = outline
+        self.outline = _simplify(outline + [outline[0]], SIMPLIFY_EPS_M)
+        if len(self._heat) < n:
+            self._heat.extend([0, 0.0, 0.0, 0.0] for _ in range(n - len(self._heat)))
+        self.outline_version += 1
+        self._trace_bins = {}
+
+    # ---- Heat-map (listener telemetry_store) --------------------------
+    def on_append(self, p: dict):
+        with self._lock:
+            self._check_session(p.get("session_uid"))
+            if self._add_heat(p):
+                self.heat_version += 1
+
+    def _add_heat(self, p: dict) -> bool:
+        dist = p.get("lapDist")
+        if dist is None or dist < 0.0:
+            return False
+        b = int(dist / self.bin_m)
+        vals = (1, float(p.get("speed", 0) or 0), float(p.get("brake", 0.0) or 0.0),
+                float(p.get("throttle", 0.0) or 0.0))
+        heat = self._heat
+        if b >= len(heat):
+            heat.extend([0, 0.0, 0.0, 0.0] for _ in range(b + 1 - len(heat)))
+        runs = self._heat_runs
+        lap = p.get("lap")
+        if not runs or runs[-1][0] != lap:
+            runs.append((lap, {}))
+        run = runs[-1][1].setdefault(b, [0, 0.0, 0.0, 0.0])
+        h = heat[b]
+        for k in range(4):
+            h[k] += vals[k]
+            run[k] += vals[k]
+        return True
+
+    def on_rewind(self, buf, lap_tail):
+        """
+        Flashback : retire l'apport des tours coupés (depuis la fin jusqu'au
+        tour de reprise inclus) puis rejoue les points survivants de ce tour.
+        """
+        with self._lock:
+            if not buf:
+                self._heat = []
+                self._heat_runs.clear()
+                self.heat_version += 1
+                return
+            lap = buf[-1].get("lap")
+            runs = self._heat_runs
+            found = False
+            while runs and not found:
+                run_lap, bins = runs.pop()
+                for b, v in bins.items():
+                    h = self._heat[b]
+                    for k in range(4):
+                        h[k] -= v[k]
+                    if h[0] <= 0:
+                        h[:] = [0, 0.0, 0.0, 0.0]
+                found = (run_lap == lap)
+            if not found:   # tour de reprise hors de HEAT_UNDO_LAPS : apport gardé
+                self.heat_version += 1
+                return
+            for p in lap_tail:
+                self._add_heat(p)
+            self.heat_version += 1
+
+    def heat(self, channel: str = "speed") -> list:
+        """Moyenne du canal par bin du tracé (None si bin jamais vu)."""
+        k = 1 + HEAT_CHANNELS.index(channel)
+        with self._lock:
+            n = len(self.outline_bins)
+            return [(h[k] / h[0]) if h[0] else None for h in self._heat[:n]]
+
+    def cars_snapshot(self):
+        with self._lock:
+            return list(self.cars), self.player_idx
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._session = None
+
+
+# Instance partagée (capture + dashboard)
+track_map = TrackMap()